@@ -76,6 +76,9 @@ ACL_MEMCPY_HOST_TO_DEVICE = 1
 ACL_MEMCPY_DEVICE_TO_HOST = 2
 ACL_MEMCPY_DEVICE_TO_DEVICE = 3
 
+# input of the batch size of models with dynamic batch gears
+ACL_DYNAMIC_TENSOR_NAME = "ascend_mbatch_shape_data"
+
 
 # input
 LAST_ONE = -1
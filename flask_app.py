@@ -1,189 +1,484 @@
-"""
-PyACL Flask Rest-API
-Copyright 2022 Huawei Technologies Co., Ltd
-
-Usage:
-  $ python3 app.py
-
-CREATED:  2021-11-24 15:12:13
-MODIFIED: 2022-02-10 00:48:45
-"""
-# -*- coding:utf-8 -*-
-import numpy as np
-import werkzeug
-werkzeug.cached_property = werkzeug.utils.cached_property
-
-from os import path
-from PIL import Image
-from time import sleep
-from uuid import uuid4
-from io import BytesIO
-from model.acl import NET
-from base64 import b64encode
-from redis import StrictRedis
-from configparser import ConfigParser
-from utils.preprocessing import preprocess
-from flask import Flask, json, Response, request
-from flask_restplus import Api, Resource, reqparse
-
-
-# initialize flask app
-app = Flask(__name__)
-
-# define configurations
-print("[INFO] loading configurations . . .")
-app.cfg = ConfigParser()
-app.cfg.read(path.abspath('./data/app.cfg'))
-
-
-# return the succes message with api
-def error_handle(output, status=500, mimetype='application/json'):
-    return Response(output, status=status, mimetype=mimetype)
-
-# return the error message with api
-def success_handle(output, status=200, mimetype='application/json'):
-    return Response(output, status=status, mimetype=mimetype)
-
-
-# base64 encoding
-def base64_encode_image(a):
-    # base64 encode the input NumPy array
-    return b64encode(a).decode("utf-8")
-
-# run yolov5 detector
-def run_detector(img, model_input_size):
-    print("[INFO] running model . . .")
-
-    # convert RGB PIL image to RGB Cv2 image
-    img_rgb = np.array(img.convert('RGB'))
-    # convert img to data
-    img_data = preprocess(img_rgb, model_input_size)
-            
-    # ensure our NumPy array is C-contiguous as well,
-    # otherwise we won't be able to serialize it
-    img_data = img_data.copy(order="C")
-            
-    # generate an ID for the classification then add the
-    # classification ID + image to the queue
-    k = str(uuid4())
-    img_data_dims = img_data.shape
-    img_data = base64_encode_image(img_data)
-    d = {"id": k, "img": img_data, "img_dims" : img_rgb.shape, 
-        "img_np_dims" : img_data_dims}
-    app.redis_db.rpush('model_img_queue', json.dumps(d))
-            
-    # keep looping until our model server returns the output
-    # predictions
-    bboxes = ""
-    while True:
-        # attempt to grab the output predictions
-        output = app.redis_db.get(k)
-                
-        # check to see if our model has classified the input
-        # image
-        if output is not None:
-            # add the output predictions to our data
-            # dictionary so we can return it to the client
-            output = output.decode("utf-8")
-            bboxes = json.loads(output)
-                    
-            # delete the result from the database and break
-            # from the polling loop
-            app.redis_db.delete(k)
-            break
-                    
-        # sleep for a small amount to give the model a chance
-        # to classify the input image
-        sleep(app.cfg.getfloat('test', 'sleep'))
-
-    print("[RESULT] bboxes --> ", bboxes)
-    return bboxes
-
-
-# initialize flask restful app
-resutfulApp = Api(app = app, 
-                  version = app.cfg.get('swagger', 'version'), 
-                  title = app.cfg.get('swagger', 'title'), 
-                  description = app.cfg.get('swagger', 'description1'))
-name_space = resutfulApp.namespace('analyze', description = app.cfg.get('swagger', 'description2'))
-
-
-#ModelService swagger settings
-model_service_param_parser = reqparse.RequestParser()
-model_service_param_parser.add_argument('image',  
-                         type=werkzeug.datastructures.FileStorage, 
-                         location='files', 
-                         required=True, 
-                         help='Image file')
-
-# run model
-@name_space.route('', methods = ['POST'])
-@name_space.expect(model_service_param_parser)
-@resutfulApp.doc(responses={
-        200: 'Success',
-        400: 'Validation Error'
-    },description = app.cfg.get('swagger', 'description3')
-    )
-class ModelService(Resource):
-    def post(self):
-        # check image is uploaded with image keyword
-        if 'image' not in request.files:
-            print("[ERROR] image required")
-            return error_handle(json.dumps({"errorMessage" : "image required"}), 400)
-        
-        image = request.files['image']
-        print("[INFO] image : %s"% image)
-        
-        # chech extension of image
-        filename = image.filename
-        if '.' in filename and \
-        filename.rsplit('.', 1)[1].lower() not in app.allowed_extensions:
-            return error_handle(json.dumps({"errorMessage" : "image format must be one of " + \
-                                app.allowed_extensions}), status=400)
-        
-        # read the image in PIL format
-        print("[INFO] loading image . . .")
-        img = image.read()
-        # convert image format
-        try:
-            img = Image.open(BytesIO(img))
-        except:
-            return error_handle(json.dumps({"errorMessage" : "Uploaded file is not a valid image"}), 
-                                        status=400)
-        
-        # check min resolution
-        width, height = img.size
-        if width < app.min_width or height < app.min_height :
-            return error_handle(json.dumps({"errorMessage" : "Image resolution must be greater than 300x300"}), 
-                                        status=400)
-
-        # deserialize the text-detection model output info
-        q_model_input_dims = json.loads(app.redis_db.lrange('model_input_dims', 0, 2)[0].decode("utf-8"))
-        boxes_coord = run_detector(img, (q_model_input_dims['w'], q_model_input_dims['h']))
-
-        return success_handle(json.dumps(boxes_coord))
-
-
-def init():
-    # connect to Redis server
-    print("[INFO] initialize the redis server . . .")
-    app.redis_db = StrictRedis(host=app.cfg.get('db-server', 'host'),
-                            port=app.cfg.getint('db-server', 'port'), 
-                            db=app.cfg.getint('db-server', 'db_num'))
-    
-    # define allowed file types
-    app.allowed_extensions = app.cfg.get('file', 'allowed_extensions')
-
-    # define allowed min image size
-    app.min_width = app.cfg.getint('file', 'min_width')
-    app.min_height = app.cfg.getint('file', 'min_height')
-
-# run api 
-if __name__ == "__main__":
-    print("[INFO] strating ocr_api . . .")
-    init()
-        
-    app.run(host = app.cfg.get('rest-server', 'host'), 
-            port = app.cfg.get('rest-server', 'port'),
-            threaded = app.cfg.get('rest-server', 'threaded'),
+"""
+PyACL Flask Rest-API
+Copyright 2022 Huawei Technologies Co., Ltd
+
+Usage:
+  $ python3 app.py
+
+CREATED:  2021-11-24 15:12:13
+MODIFIED: 2026-10-19 12:31:12
+"""
+# -*- coding:utf-8 -*-
+import numpy as np
+import werkzeug
+werkzeug.cached_property = werkzeug.utils.cached_property
+
+from os import path
+from PIL import Image
+from uuid import uuid4
+from time import time, perf_counter
+from select import select
+from socket import MSG_PEEK
+from threading import Lock
+from contextlib import contextmanager
+from utils import codec
+from redis import StrictRedis
+from configparser import ConfigParser
+from utils.shm_ring import attach_ring
+from utils.admission import AdmissionController, STATS_KEY
+from model.registry import model_names, model_config, model_key
+from utils.results import load_class_names, mimetypes, render
+from utils.metrics import StageTimings, elapsed_ms, read_worker_metrics, read_worker_timings
+from utils.redis_queue import make_queue, wait_reply, cancel
+from utils.threads import limit_threads
+from utils.upload import spool_stream, upload_buffer
+from utils.letterbox import choose_input_shape, letterbox_plan
+from utils.preprocessing import preprocess, preprocess_into, decode_image
+from flask import Flask, Request, json, Response, request
+from flask_restplus import Api, Resource, reqparse
+
+
+# the uploaded files are spooled while the body is parsed, in memory up
+# to spool_size bytes of body and in a temporary file above
+class UploadRequest(Request):
+    def _get_file_stream(self, total_content_length, content_type, filename=None,
+                         content_length=None):
+        return spool_stream(total_content_length, app.spool_size)
+
+# initialize flask app
+app = Flask(__name__)
+app.request_class = UploadRequest
+
+# define configurations
+print("[INFO] loading configurations . . .")
+app.cfg = ConfigParser()
+app.cfg.read(path.abspath('./data/app.cfg'))
+
+
+# return the succes message with api
+def error_handle(output, status=500, mimetype='application/json', headers=None):
+    return Response(output, status=status, mimetype=mimetype, headers=headers)
+
+# return the error message with api
+def success_handle(output, status=200, mimetype='application/json'):
+    return Response(output, status=status, mimetype=mimetype)
+
+
+# the shared memory ring of the model server while a request writes
+# into it, None without the shm transport. The ring is attached again
+# when a restarted worker has published a new one, the replaced ring is
+# closed once the requests still writing into it are done
+@contextmanager
+def shm_ring():
+    ring = None
+    if app.transport == 'shm':
+        with app.shm_lock:
+            ring = app.shm_ring
+            if ring is None or ring.stale(app.redis_db):
+                app.shm_ring = attach_ring(app.redis_db, app.cfg.get('transport', 'shm_name'))
+                if ring is not None and not app.shm_users.get(ring):
+                    ring.close()
+                ring = app.shm_ring
+            if ring is not None:
+                app.shm_users[ring] = app.shm_users.get(ring, 0) + 1
+    try:
+        yield ring
+    finally:
+        if ring is not None:
+            with app.shm_lock:
+                app.shm_users[ring] -= 1
+                if not app.shm_users[ring]:
+                    del app.shm_users[ring]
+                    if ring is not app.shm_ring:
+                        ring.close()
+
+# add the classification ID + image to the queue of the model
+def enqueue_image(model, k, img_data, **meta):
+    with shm_ring() as ring:
+        if app.transport == 'shm' and ring is None:
+            print("[ERROR] shared memory ring is not created yet")
+            return False
+
+        start = perf_counter()
+        # uploads bigger than a slot are sent within the message
+        if ring is not None and img_data.nbytes <= ring.slot_size:
+            # write the image into a free slot, only the slot index
+            # travels through the queue
+            slot = ring.acquire(app.redis_db, max(meta['deadline'] - time(), 0.001))
+            if slot is None:
+                print("[ERROR] no free shared memory slot before the deadline")
+                return False
+            try:
+                np.copyto(ring.view(slot, img_data.dtype, img_data.shape), img_data)
+                model["queue"].put(codec.encode_header(k, img_data.dtype, img_data.shape, 
+                                                       slot=slot, generation=ring.generation,
+                                                       **meta))
+            except Exception:
+                # nobody else would give the slot back
+                ring.release(app.redis_db, [slot])
+                raise
+        else:
+            model["queue"].put(codec.encode(k, img_data, **meta))
+        app.timings.observe('enqueue', elapsed_ms(start))
+
+    return True
+
+# preprocess the image and add it to the queue of the model with the
+# ratio_pad of its letterbox, with the shared memory transport the model
+# input is written straight into a slot
+def enqueue_tensor(model, k, img_rgb, model_input_size, **meta):
+    w, h = model_input_size
+    shape = (1, 12, h // 2, w // 2)
+    with shm_ring() as ring:
+        if ring is None or 4 * 12 * (h // 2) * (w // 2) > ring.slot_size:
+            start = perf_counter()
+            img_data, meta['ratio_pad'] = preprocess(img_rgb, model_input_size, meta['img_dims'])
+            app.timings.observe('preprocess', elapsed_ms(start))
+            return enqueue_image(model, k, img_data, **meta)
+
+        # the wait for a free slot is part of the enqueue
+        start = perf_counter()
+        slot = ring.acquire(app.redis_db, max(meta['deadline'] - time(), 0.001))
+        if slot is None:
+            print("[ERROR] no free shared memory slot before the deadline")
+            return False
+        enqueue_ms = elapsed_ms(start)
+
+        try:
+            start = perf_counter()
+            meta['ratio_pad'] = preprocess_into(img_rgb, ring.view(slot, np.float32, shape)[0],
+                                                model_input_size, meta['img_dims'])
+            app.timings.observe('preprocess', elapsed_ms(start))
+
+            start = perf_counter()
+            model["queue"].put(codec.encode_header(k, np.float32, shape, slot=slot,
+                                                   generation=ring.generation, **meta))
+            app.timings.observe('enqueue', enqueue_ms + elapsed_ms(start))
+        except Exception:
+            # nobody else would give the slot back
+            ring.release(app.redis_db, [slot])
+            raise
+
+    return True
+
+# check if the client of the current request has closed the connection,
+# only works with servers exposing the client socket in the environ
+def client_disconnected():
+    sock = request.environ.get('gunicorn.socket') or request.environ.get('werkzeug.socket')
+    if sock is None:
+        return False
+    try:
+        readable, _, _ = select([sock], [], [], 0)
+        return bool(readable) and sock.recv(1, MSG_PEEK) == b''
+    except (OSError, ValueError):
+        return True
+
+# block until our model server pushes the output of request "k" or the
+# deadline passes, the queued image is cancelled if no reply comes
+def wait_detector(k, deadline):
+    while True:
+        timeout = min(app.disconnect_check, deadline - time())
+        if timeout <= 0:
+            print("[ERROR] no reply for %s before the deadline"% k)
+            break
+
+        output = wait_reply(app.redis_db, k, timeout)
+        if output is not None:
+            return output
+
+        if client_disconnected():
+            print("[INFO] client of %s disconnected"% k)
+            break
+
+    # the marker lasts until the image expires in the queue, the workers
+    # drop it unprocessed until then
+    cancel(app.redis_db, k, max(app.reply_ttl, int(deadline - time()) + 1))
+    return None
+
+# run yolov5 detector
+def run_detector(model, img, img_buf, input_shapes, timeout):
+    print("[INFO] running model . . .")
+
+    # the smallest (h, w) input shape of the model holding the image,
+    # the model server batches the images of a shape together
+    width, height = img.size
+    shape = choose_input_shape((height, width), input_shapes)
+
+    # generate an ID for the classification then add the
+    # classification ID + image to the queue as a binary message,
+    # the model server drops the image once its deadline has passed
+    k = str(uuid4())
+    now = time()
+    deadline = now + timeout
+    if app.payload == 'encoded':
+        # send the uploaded file as it is, the model server decodes 
+        # and preprocesses it
+        img_data = np.frombuffer(img_buf, dtype=np.uint8)
+        if not enqueue_image(model, k, img_data, img_dims=(height, width, 3), 
+                             ts=now, deadline=deadline, encoded=True, input_shape=shape,
+                             ratio_pad=letterbox_plan((height, width), shape)[2]):
+            return None
+    else:
+        # decode the upload straight to a RGB array, a big JPEG at the
+        # smallest DCT scale still holding the input shape, raises
+        # ValueError if it is not a valid image
+        start = perf_counter()
+        img_rgb, img_dims = decode_image(img_buf, (shape[1], shape[0]), app.max_pixels,
+                                         ((height, width, 3), img.format))
+        app.timings.observe('decode', elapsed_ms(start))
+        # convert img to data, in its shared memory slot if there is one
+        if not enqueue_tensor(model, k, img_rgb, (shape[1], shape[0]), img_dims=img_dims,
+                              ts=now, deadline=deadline, input_shape=shape):
+            return None
+            
+    start = perf_counter()
+    output = wait_detector(k, deadline)
+    if output is None:
+        return None
+    app.timings.observe('wait', elapsed_ms(start))
+
+    # deserialize the detections array and the reply meta data
+    dets, meta = codec.decode_result(output)
+
+    print("[RESULT] %d bboxes for %s"% (len(dets), k))
+    return k, dets, meta
+
+
+# initialize flask restful app
+resutfulApp = Api(app = app, 
+                  version = app.cfg.get('swagger', 'version'), 
+                  title = app.cfg.get('swagger', 'title'), 
+                  description = app.cfg.get('swagger', 'description1'))
+name_space = resutfulApp.namespace('analyze', description = app.cfg.get('swagger', 'description2'))
+
+
+#ModelService swagger settings
+model_service_param_parser = reqparse.RequestParser()
+model_service_param_parser.add_argument('image',  
+                         type=werkzeug.datastructures.FileStorage, 
+                         location='files', 
+                         required=True, 
+                         help='Image file')
+model_service_param_parser.add_argument('timeout',  
+                         type=float, 
+                         location='form', 
+                         required=False, 
+                         help='Seconds to wait for the result (default and max in the config)')
+model_service_param_parser.add_argument('model',  
+                         type=str, 
+                         location='args', 
+                         required=False, 
+                         help='Model to run, one of [registry] models (default the first)')
+
+# run model
+@name_space.route('', methods = ['POST'])
+@name_space.expect(model_service_param_parser)
+@resutfulApp.doc(responses={
+        200: 'Success',
+        400: 'Validation Error',
+        429: 'Too Many Requests',
+        503: 'Model Server Unavailable',
+        504: 'Deadline Exceeded'
+    },description = app.cfg.get('swagger', 'description3')
+    )
+class ModelService(Resource):
+    def post(self):
+        start = perf_counter()
+        # the model is in the query string, so it is known before the
+        # upload is read
+        name = request.args.get('model', app.default_model)
+        if name not in app.models:
+            return error_handle(json.dumps({"errorMessage" : "model must be one of " + \
+                                ", ".join(app.models)}), status=400)
+        model = app.models[name]
+
+        # reject early, before the upload is read, when the model
+        # servers can not answer in time
+        if model["admission"] is not None:
+            admitted, status, retry_after, reason = model["admission"].admit()
+            if not admitted:
+                print("[WARNING] request shed: %s"% reason)
+                return error_handle(json.dumps({"errorMessage" : "Server is overloaded (%s)"% reason}), 
+                                    status=status, headers={'Retry-After': str(retry_after)})
+
+        # check image is uploaded with image keyword
+        if 'image' not in request.files:
+            print("[ERROR] image required")
+            return error_handle(json.dumps({"errorMessage" : "image required"}), 400)
+        
+        image = request.files['image']
+        print("[INFO] image : %s"% image)
+        
+        # chech extension of image
+        filename = image.filename
+        if '.' in filename and \
+        filename.rsplit('.', 1)[1].lower() not in app.allowed_extensions:
+            return error_handle(json.dumps({"errorMessage" : "image format must be one of " + \
+                                app.allowed_extensions}), status=400)
+        
+        # the spooled upload without copying it, uploads over
+        # MAX_CONTENT_LENGTH were refused with 413 before being read
+        print("[INFO] loading image . . .")
+        img_buf = upload_buffer(image.stream)
+        # convert image format, only the header is parsed here
+        try:
+            image.stream.seek(0)
+            img = Image.open(image.stream)
+        except:
+            return error_handle(json.dumps({"errorMessage" : "Uploaded file is not a valid image"}), 
+                                        status=400)
+        app.timings.observe('read', elapsed_ms(start))
+        
+        # check min resolution
+        width, height = img.size
+        if width < app.min_width or height < app.min_height :
+            return error_handle(json.dumps({"errorMessage" : "Image resolution must be greater than 300x300"}), 
+                                        status=400)
+
+        # refuse the decompression bombs before anything is decoded
+        if app.max_pixels and width * height > app.max_pixels:
+            return error_handle(json.dumps({"errorMessage" : "Image must have at most %d pixels"% 
+                                app.max_pixels}), status=400)
+
+        # check the requested timeout
+        timeout = request.form.get('timeout', app.deadline, type=float)
+        if not 0 < timeout <= app.max_deadline:
+            return error_handle(json.dumps({"errorMessage" : "timeout must be in (0, %s] seconds"% 
+                                app.max_deadline}), status=400)
+
+        # deserialize the text-detection model output info, the workers
+        # before the input shapes only publish w and h
+        q_model_input_dims = app.redis_db.lrange(model_key(model["cfg"], 'model_input_dims'), 0, 2)
+        if not q_model_input_dims:
+            return error_handle(json.dumps({"errorMessage" : "Model %s is not served"% name}), 
+                                        status=503)
+        q_model_input_dims = json.loads(q_model_input_dims[0].decode("utf-8"))
+        input_shapes = q_model_input_dims.get('shapes') or \
+                       [[q_model_input_dims['h'], q_model_input_dims['w']]]
+        try:
+            output = run_detector(model, img, img_buf, input_shapes, timeout)
+        except ValueError:
+            return error_handle(json.dumps({"errorMessage" : "Uploaded file is not a valid image"}), 
+                                        status=400)
+        if output is None:
+            return error_handle(json.dumps({"errorMessage" : "Model server did not reply in time"}), 
+                                        status=504)
+        k, dets, meta = output
+        if "errorMessage" in meta:
+            # a bad upload unless the worker tells another status
+            return error_handle(json.dumps({"errorMessage" : meta["errorMessage"]}), 
+                                status=meta.get("status", 400))
+
+        # answer in the format asked by the Accept header, json by default
+        mimetype = request.accept_mimetypes.best_match(mimetypes(), default='application/json')
+        response = success_handle(render(k, dets, mimetype, model["class_names"]), mimetype=mimetype)
+        app.timings.observe('request', elapsed_ms(start))
+        return response
+
+
+metrics_space = resutfulApp.namespace('metrics', description = 'Rest api metrics')
+
+# show metrics
+@metrics_space.route('', methods = ['GET'])
+class MetricsService(Resource):
+    def get(self):
+        metrics = {}
+        # by model, the metrics of the default model are the ones of a
+        # single model server
+        for model in app.models.values():
+            if model["admission"] is not None:
+                metrics[model_key(model["cfg"], 'admission')] = model["admission"].snapshot()
+        metrics['workers'] = read_worker_metrics(app.redis_db)
+
+        return success_handle(json.dumps(metrics))
+
+
+# show the p50/p95/p99 milliseconds of the stages of the api and the
+# workers, by batch size
+@metrics_space.route('/timings', methods = ['GET'])
+class TimingsService(Resource):
+    def get(self):
+        timings = {'api': app.timings.snapshot(),
+                   'workers': read_worker_timings(app.redis_db)}
+
+        return success_handle(json.dumps(timings))
+
+
+def init_model(cfg):
+    # the queue, admission control and class names of one model
+    model = {"cfg": cfg, "queue": make_queue(app.redis_db, cfg)}
+
+    # define the class names sent with the detections
+    model["class_names"] = None
+    if cfg.get('model', 'names'):
+        model["class_names"] = load_class_names(path.abspath(cfg.get('model', 'names')))
+
+    # define the admission control
+    model["admission"] = None
+    if cfg.getboolean('admission', 'enabled'):
+        model["admission"] = AdmissionController(app.redis_db, model["queue"],
+                                                 cfg.getfloat('admission', 'wait_budget'),
+                                                 cfg.getint('admission', 'max_depth'),
+                                                 cfg.getfloat('admission', 'stale_after'),
+                                                 cfg.getfloat('admission', 'refresh'),
+                                                 model_key(cfg, STATS_KEY))
+    return model
+
+
+def init():
+    # connect to Redis server
+    print("[INFO] initialize the redis server . . .")
+    app.redis_db = StrictRedis(host=app.cfg.get('db-server', 'host'),
+                            port=app.cfg.getint('db-server', 'port'), 
+                            db=app.cfg.getint('db-server', 'db_num'))
+
+    # define the served models, the requests without a model go to the
+    # first one
+    app.default_model = model_names(app.cfg)[0]
+    app.models = dict((name, init_model(model_config(app.cfg, name)))
+                      for name in model_names(app.cfg))
+    
+    # define allowed file types
+    app.allowed_extensions = app.cfg.get('file', 'allowed_extensions')
+
+    # define allowed min image size
+    app.min_width = app.cfg.getint('file', 'min_width')
+    app.min_height = app.cfg.getint('file', 'min_height')
+    # define the most pixels of an image that are decoded
+    app.max_pixels = app.cfg.getint('file', 'max_pixels')
+
+    # define the biggest request body, checked before it is read, and
+    # the body size up to which the upload stays in memory
+    app.config['MAX_CONTENT_LENGTH'] = int(app.cfg.getfloat('file', 'max_upload_mb') * 1024 * 1024)
+    app.spool_size = app.cfg.getint('file', 'spool_kb') * 1024
+
+    # define how long a request waits for the model server
+    app.deadline = app.cfg.getfloat('queue', 'deadline')
+    app.max_deadline = app.cfg.getfloat('queue', 'max_deadline')
+    app.disconnect_check = app.cfg.getfloat('queue', 'disconnect_check')
+    app.reply_ttl = app.cfg.getint('queue', 'reply_ttl')
+
+    # define how the images are passed to the model server
+    app.transport = app.cfg.get('transport', 'mode')
+    app.payload = app.cfg.get('transport', 'payload')
+    app.shm_ring = None
+    app.shm_users = {}  # requests writing into a ring, by ring
+    app.shm_lock = Lock()
+
+    # every request thread preprocesses its image, each keeps to the
+    # cv2 and BLAS threads of the limits
+    limit_threads(app.cfg.getint('transport', 'cv2_threads'),
+                  app.cfg.getint('transport', 'blas_threads'))
+
+    # define the timings of the stages of the requests
+    app.timings = StageTimings()
+
+# run api 
+if __name__ == "__main__":
+    print("[INFO] strating ocr_api . . .")
+    init()
+        
+    app.run(host = app.cfg.get('rest-server', 'host'), 
+            port = app.cfg.get('rest-server', 'port'),
+            threaded = app.cfg.get('rest-server', 'threaded'),
             debug = app.cfg.getboolean('rest-server', 'debug'))
\ No newline at end of file
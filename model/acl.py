@@ -1,207 +1,381 @@
 """
 This script provide asynchronous inference, it collects 
-a couple of image from queue and process them
+a couple of image from queue and process them, the "acl" backend of
+model/backend.py
+
+The images of a batch are packed into the NCHW input of one model
+launch. A model with dynamic batch gears (atc --dynamic_batch_size) runs
+at the smallest gear holding the images, with several OM files compiled
+for static batch sizes the smallest one holding them is used. Only the
+remainder of a batch is padded. The images may have several input
+shapes, of the dynamic image size gears of a model (atc
+--dynamic_image_size) or of OM files compiled for different shapes, the
+images of a shape run together.
+
+The batches are spread over several streams, each one stages its
+images in pinned host memory then queues the input copy, the launch and
+the output copy with memcpy_async and execute_async, so the copies of a
+batch overlap the compute of the others. One report thread, started
+with the model, runs the callbacks of every stream. submit() returns a
+future of the feature maps, so several batches can be in flight.
+
+Every launch holds a slot of the device pool of its model. A batch
+needing more launches than a pool gives at once runs in waves, one
+after the other in a thread of its own, behind one future. The feature
+maps of every wave are copied out so its slots can go back before the
+next one. The batches submitted after it wait for its last wave, they
+would otherwise take the slots its next wave waits for and hold them
+until it is postprocessed. get_max_submit_size gives the largest batch
+running without waves, the worker keeps its batches to it.
+
+The NET instances of a process share one context per device, the
+models of the model registry run side by side on it.
 
 Copyright 2022 Huawei Technologies Co., Ltd
 
 CREATED:  2022-02-06 20:12:13
-MODIFIED: 2022-02-09 22:30:45
+MODIFIED: 2026-10-19 13:06:40
 """
 # -*- coding:utf-8 -*-
 import acl
+import atexit
 
+from threading import Lock
+from concurrent.futures import Future, ThreadPoolExecutor
 from utils.acl_util import check_ret
-from data.constant import ACL_MEM_MALLOC_NORMAL_ONLY, \
-    ACL_MEMCPY_HOST_TO_DEVICE, ACL_MEMCPY_DEVICE_TO_HOST
-from utils.postprocessing import detect, non_max_suppression, \
-                                scale_coords
+from model.backend import Backend
+from model.device_pool import DevicePool
+from data.constant import ACL_ERROR_NONE, ACL_DYNAMIC_TENSOR_NAME
+
+
+# context and NET count of the opened devices
+_devices = {}
+_devices_lock = Lock()
+_initialized = False
+
+
+def _open_device(device_id):
+    # the context of the device, acl is initialized once per process
+    global _initialized
+    with _devices_lock:
+        if not _initialized:
+            ret = acl.init()
+            check_ret("acl.init", ret)
+            atexit.register(acl.finalize)
+            _initialized = True
+
+        if device_id not in _devices:
+            ret = acl.rt.set_device(device_id)
+            check_ret("acl.rt.set_device", ret)
+            context, ret = acl.rt.create_context(device_id)
+            check_ret("acl.rt.create_context", ret)
+            _devices[device_id] = [context, 0]
+
+        _devices[device_id][1] += 1
+        return _devices[device_id][0]
+
+
+def _close_device(device_id):
+    # reset the device once its last NET is closed
+    with _devices_lock:
+        _devices[device_id][1] -= 1
+        if _devices[device_id][1] == 0:
+            context, _ = _devices.pop(device_id)
+            ret = acl.rt.destroy_context(context)
+            check_ret("acl.rt.destroy_context", ret)
+            ret = acl.rt.reset_device(device_id)
+            check_ret("acl.rt.reset_device", ret)
+
+
+class OmModel(object):
+    # one loaded OM file with its device pool, a slot holds the input and
+    # outputs of one launch, up to max_batch images
+    def __init__(self, model_path, pool_size, pool_policy):
+        self.model_path = model_path
+        self.model_id, ret = acl.mdl.load_from_file(model_path) # load model
+        check_ret("acl.mdl.load_from_file", ret)
+
+        self.model_desc = acl.mdl.create_desc()
+        ret = acl.mdl.get_desc(self.model_desc, self.model_id)
+        check_ret("acl.mdl.get_desc", ret)
+
+        input_size = acl.mdl.get_num_inputs(self.model_desc)
+        output_size = acl.mdl.get_num_outputs(self.model_desc)
+        print("=" * 90)
+
+        print("[MODEL] %s input size"% model_path, input_size)
+        for i in range(input_size):
+            print(">> input ", i)
+            print("model input dims", acl.mdl.get_input_dims(self.model_desc, i))
+            print("model input datatype", acl.mdl.get_input_data_type(self.model_desc, i))
+        self.input_dims = tuple(acl.mdl.get_input_dims(self.model_desc, 0)[0]['dims'])
+        print("=" * 90)
+
+        print("[MODEL] %s output size"% model_path, output_size)
+        self.output_dims = []
+        for i in range(output_size):
+            print(">> output ", i)
+            print("model output dims", acl.mdl.get_output_dims(self.model_desc, i))
+            print("model output datatype", acl.mdl.get_output_data_type(self.model_desc, i))
+            self.output_dims.append(tuple(acl.mdl.get_output_dims(self.model_desc, i)[0]['dims']))
+        print("=" * 90)
+
+        # the batch sizes and (h, w) input shapes the model runs at, the
+        # gears of a dynamic batch or image size model or the static dims
+        # of the input, which is focused to half the image size
+        self.batch_sizes = [self.input_dims[0]]
+        self.shapes = [(self.input_dims[2] * 2, self.input_dims[3] * 2)]
+        self.dynamic = None
+        self.dynamic_index, ret = acl.mdl.get_input_index_by_name(self.model_desc,
+                                                                  ACL_DYNAMIC_TENSOR_NAME)
+        if ret == ACL_ERROR_NONE:
+            gears, ret = acl.mdl.get_dynamic_batch(self.model_desc)
+            check_ret("acl.mdl.get_dynamic_batch", ret)
+            if gears['batchCount']:
+                self.dynamic = 'batch'
+                self.batch_sizes = sorted(gears['batch'])
+            else:
+                gears, ret = acl.mdl.get_dynamic_hw(self.model_desc, -1)
+                check_ret("acl.mdl.get_dynamic_hw", ret)
+                self.dynamic = 'hw'
+                self.shapes = sorted((h * 2, w * 2) for h, w in gears['hw'])
+        self.max_batch = self.batch_sizes[-1]
+        self.max_area = max(h * w for h, w in self.shapes)
+        self.image_size = acl.mdl.get_input_size_by_index(self.model_desc, 0) // self.max_batch
+        print("[MODEL] batch sizes", self.batch_sizes, "input shapes", self.shapes)
+
+        # the input and output datasets are allocated once and reused
+        self.pool = DevicePool(self.model_desc, pool_size, pool_policy)
+
+
+    def image_bytes(self, shape):
+        # bytes of the input of one image of (h, w) shape
+        return self.image_size * shape[0] * shape[1] // self.max_area
+
+
+    def memory_size(self):
+        # device bytes of the weights, the work memory and the pool slots
+        work_size, weight_size, ret = acl.mdl.query_size(self.model_path)
+        check_ret("acl.mdl.query_size", ret)
+        slot_size = sum(self.pool.slots[0].input_sizes) + sum(self.pool.slots[0].output_sizes)
+        return work_size + weight_size + len(self.pool.slots) * slot_size
+
+
+    def destroy(self):
+        if self.pool:
+            self.pool.destroy()
+
+        if self.model_id:
+            ret = acl.mdl.unload(self.model_id)
+            check_ret("acl.mdl.unload", ret)
+
+        if self.model_desc:
+            ret = acl.mdl.destroy_desc(self.model_desc)
+            check_ret("acl.mdl.destroy_desc", ret)
 
 
-class NET(object):
+class NET(Backend):
     
     def __init__(self, 
                 device_id,
-                model_path):
+                model_path,
+                pool_size=3,
+                pool_policy='block',
+                streams=2):
+        Backend.__init__(self)
         self.device_id = device_id    # int
-        self.model_path = model_path  # string
+        # string, or a list of OM files compiled for different batch sizes
+        self.model_path = [model_path] if isinstance(model_path, str) else model_path
+        self.pool_size = pool_size    # int, launch datasets allocated at load
+        self.pool_policy = pool_policy  # string, block | grow | reject
+        self.stream_num = streams     # int, batches on the device at once
 
-        self.input_size = 0
-        self.output_size = 0
-        self.class_num = 0
-        self.img_dims = None
-        
-        self.model_id = None    # pointer
         self.context = None     # pointer
-        self.stream = None      # pointer
-        self.model_desc = None  # pointer when using
-        self.input_data = None
-        self.output_data = None
-       
-        self.model_output_dims = []
-        self.dataset_list = []
-
+        self.streams = []       # pointers
+        self.next_stream = 0
+        self.models = []
+
+        # serializes the staging and launches of submit, held by the wave
+        # thread until the last wave of a batch bigger than the pools is
+        # done, so it is a Lock another thread may release
+        self.submit_lock = Lock()
+        # runs the waves of the batches bigger than the pools
+        self.wave_executor = ThreadPoolExecutor(1)
+
+        self.tid = None         # report thread
         self.exit_flag = False
 
         self.__init_resource()
         
         
     def __del__(self):
-        print('[ACL] release source stage:')
-        if self.model_id:
-            ret = acl.mdl.unload(self.model_id)
-            check_ret("acl.mdl.unload", ret)
+        self.close()
 
-        if self.model_desc:
-            ret = acl.mdl.destroy_desc(self.model_desc)
-            check_ret("acl.mdl.destroy_desc", ret)
 
-        self.__destroy_dataset_and_databuf()
+    def close(self):
+        if self.context is None:
+            return
 
-        if self.stream:
-            result = acl.rt.destroy_stream(self.stream)
+        print('[ACL] release source stage:')
+        ret = acl.rt.set_context(self.context)
+        check_ret("acl.rt.set_context", ret)
+        self.wave_executor.shutdown()
+        self.__stop_report_thread()
+        while self.models:
+            self.models.pop().destroy()
+
+        while self.streams:
+            result = acl.rt.destroy_stream(self.streams.pop())
             check_ret("acl.rt.destroy_stream", result)
 
-        if self.context:
-            result = acl.rt.destroy_context(self.context)
-            check_ret("acl.rt.destroy_context", result)
-
-        ret = acl.rt.reset_device(self.device_id)
-        check_ret("acl.rt.reset_device", ret)
-        ret = acl.finalize()
-        check_ret("acl.finalize", ret)
+        self.context = None
+        _close_device(self.device_id)
         print('[ACL] release source stage success')
         
         
     def __init_resource(self):
         print("[ACL] init resource stage:")
-        ret = acl.init()
-        check_ret("acl.init", ret)
-            
-        ret = acl.rt.set_device(self.device_id)
-        check_ret("acl.rt.set_device", ret)
-
-        self.context, ret = acl.rt.create_context(self.device_id)
-        check_ret("acl.rt.create_context", ret)
-
-        self.stream, ret = acl.rt.create_stream()
-        check_ret("acl.rt.create_stream", ret)
-        print("[ACL] init resource stage success")
+        self.context = _open_device(self.device_id)
+        # the device may be opened by another thread
+        ret = acl.rt.set_context(self.context)
+        check_ret("acl.rt.set_context", ret)
+
+        for _ in range(max(1, self.stream_num)):
+            stream, ret = acl.rt.create_stream()
+            check_ret("acl.rt.create_stream", ret)
+            self.streams.append(stream)
+        print("[ACL] init resource stage success, %d streams"% len(self.streams))
         
         self.__get_model_info()
+        self.__start_report_thread()
+
+
+    def __start_report_thread(self):
+        # the callbacks of all the batches run in this thread, it lives
+        # as long as the streams
+        self.exit_flag = False
+        self.tid, ret = acl.util.start_thread(self.__process_callback,
+                                              [self.context, 50])
+        check_ret("acl.util.start_thread", ret)
+
+        for stream in self.streams:
+            ret = acl.rt.subscribe_report(self.tid, stream)
+            check_ret("acl.rt.subscribe_report", ret)
+
+
+    def __stop_report_thread(self):
+        if self.tid is None:
+            return
+
+        for stream in self.streams:
+            ret = acl.rt.synchronize_stream(stream)
+            check_ret("acl.rt.synchronize_stream", ret)
+            ret = acl.rt.unsubscribe_report(self.tid, stream)
+            check_ret("acl.rt.unsubscribe_report", ret)
+
+        self.exit_flag = True
+        ret = acl.util.stop_thread(self.tid)
+        check_ret("acl.util.stop_thread", ret)
+        self.tid = None
       
     
     def __get_model_info(self,):
         print("[MODEL] model init resource stage:")
-        self.model_id, ret = acl.mdl.load_from_file(self.model_path) # load model
-        check_ret("acl.mdl.load_from_file", ret)
-        
-        self.model_desc = acl.mdl.create_desc()
-        ret = acl.mdl.get_desc(self.model_desc, self.model_id)
-        check_ret("acl.mdl.get_desc", ret)
-        
-        self.input_size = acl.mdl.get_num_inputs(self.model_desc)
-        self.output_size = acl.mdl.get_num_outputs(self.model_desc)
-        print("=" * 90)
-        
-        print("[MODEL] model input size", self.input_size)
-        for i in range(self.input_size):
-            print(">> input ", i)
-            print("model input dims", acl.mdl.get_input_dims(self.model_desc, i))
-            print("model input datatype", acl.mdl.get_input_data_type(self.model_desc, i))
-            self.model_input_height, self.model_input_width = (i * 2 for i in acl.mdl.get_input_dims(self.model_desc, i)[0]['dims'][2:])
-        print("=" * 90)
-        
-        print("[MODEL] model output size", self.output_size)
-        for i in range(self.output_size):
-            print(">> output ", i)
-            print("model output dims", acl.mdl.get_output_dims(self.model_desc, i))
-            print("model output datatype", acl.mdl.get_output_data_type(self.model_desc, i))
-            self.class_num = acl.mdl.get_output_dims(self.model_desc, i)[0]['dims'][2]
-            self.model_output_dims.append(tuple(acl.mdl.get_output_dims(self.model_desc, i)[0]['dims']))
-        print("=" * 90)
+        for model_path in self.model_path:
+            self.models.append(OmModel(model_path, self.pool_size, self.pool_policy))
+
+        # the variants must only differ in their batch size and shape
+        model = self.models[0]
+        for other in self.models[1:]:
+            if other.input_dims[1] != model.input_dims[1] or \
+               [d[1:3] for d in other.output_dims] != [d[1:3] for d in model.output_dims]:
+                raise ValueError("%s and %s are not the same model"
+                                 % (model.model_path, other.model_path))
+
+        self.model_input_height, self.model_input_width = self.get_input_shapes()[-1]
+        self.model_output_dims = model.output_dims
+        self.class_num = model.output_dims[0][2]
 
         print("[MODEL] class Model init resource stage success")
         print("=" * 90)
+
+
+    def __plan(self, img_datas):
+        # the (model, batch size, image indexes, shape) launches of the
+        # images, by shape full launches at the largest batch size then
+        # the smallest batch size holding the remainder
+        groups = {}
+        for i, image_data in enumerate(img_datas):
+            shape = image_data.shape[2] * 2, image_data.shape[3] * 2
+            groups.setdefault(shape, []).append(i)
+
+        runs = []
+        for shape, indexes in groups.items():
+            sizes = sorted((b, j) for j, model in enumerate(self.models)
+                           if shape in model.shapes for b in model.batch_sizes)
+            if not sizes:
+                raise ValueError("no model takes %dx%d images" % shape)
+
+            while indexes:
+                b, j = next((s for s in sizes if s[0] >= len(indexes)), sizes[-1])
+                runs.append((self.models[j], b, indexes[:b], shape))
+                indexes = indexes[b:]
+        return runs
+
+
+    def __waves(self, runs):
+        # split the launches so that none asks a pool for more slots
+        # than it can give at once
+        waves = [[]]
+        counts = {}
+        for run in runs:
+            model = run[0]
+            limit = model.pool.max_acquire()
+            if limit is not None and counts.get(id(model), 0) >= limit:
+                waves.append([])
+                counts = {}
+            waves[-1].append(run)
+            counts[id(model)] = counts.get(id(model), 0) + 1
+        return waves
         
         
-    def __load_input_data(self, images_data):
-        print("[MODEL] create model input dataset:")
-        img_ptr = acl.util.numpy_to_ptr(images_data)  # host ptr
-        image_buffer_size = images_data.size * images_data.itemsize
-        print("[ACL] img_host_ptr, img_buf_size: ", img_ptr, image_buffer_size)
-        # memcopy host to device
-        img_device, ret = acl.rt.malloc(image_buffer_size, 
-                                        ACL_MEM_MALLOC_NORMAL_ONLY)
-        check_ret("acl.rt.malloc", ret)
-        
-        ret = acl.rt.memcpy(img_device, image_buffer_size, img_ptr,
-                            image_buffer_size, ACL_MEMCPY_HOST_TO_DEVICE)
-        check_ret("acl.rt.memcpy", ret)
-        print("[MODEL] create model input dataset success")
-
-        # create dataset in device
-        print("[MODEL] create model input dataset:")
-        img_dataset = acl.mdl.create_dataset()
-        img_data_buffer = acl.create_data_buffer(img_device, image_buffer_size)
-        
-        if img_data_buffer is None:
-            print("[ERROR] can't create data buffer, create input failed!!!")
-
-        _, ret = acl.mdl.add_dataset_buffer(img_dataset, 
-                                            img_data_buffer)
-        if ret:
-            ret = acl.destroy_data_buffer(img_data_buffer)
-            check_ret("acl.destroy_data_buffer", ret)
-        print("[MODEL] create model input dataset success")
-        
-        return img_dataset
+    def __load_input_data(self, images_data, model, slot):
+        # stage the images one after the other in the pinned NCHW input
+        # of the slot, the padding rows are not written and their
+        # outputs are dropped
+        size = model.image_bytes((images_data[0].shape[2] * 2, images_data[0].shape[3] * 2))
+        for j, image_data in enumerate(images_data):
+            image_buffer_size = image_data.size * image_data.itemsize
+            if image_buffer_size != size:
+                raise ValueError("image of %d bytes, the model input is %d bytes"
+                                 % (image_buffer_size, size))
+
+            slot.host_input[j * size:(j + 1) * size] = image_data.reshape(-1).view('uint8')
     
     
-    def __load_output_data(self):
-        print("[MODEL] create model output dataset:")
-        output_data = acl.mdl.create_dataset()
-        for i in range(self.output_size):
-            # check temp_buffer dtype
-            temp_buffer_size = acl.mdl.get_output_size_by_index(self.model_desc, i)
-            temp_buffer, ret = acl.rt.malloc(temp_buffer_size, 
-                                            ACL_MEM_MALLOC_NORMAL_ONLY)
-            check_ret("acl.rt.malloc", ret)
-            
-            data_buf = acl.create_data_buffer(temp_buffer, 
-                                            temp_buffer_size)
-            _, ret = acl.mdl.add_dataset_buffer(output_data, data_buf)
-            
-            if ret:
-                ret = acl.destroy_data_buffer(data_buf)
-                check_ret("acl.destroy_data_buffer", ret)
-        print("[MODEL] create model output dataset success")
-        return output_data
-    
-    
-    def __data_interaction(self, images_dataset_list):
+    def __data_interaction(self, images_dataset_list, runs):
         print("[ACL] data interaction from host to device")
-        for image_data in images_dataset_list:
-            img_input = self.__load_input_data(image_data)
-            infer_ouput = self.__load_output_data()
-            self.dataset_list.append([img_input, infer_ouput])
+        # take datasets allocated at load time, nothing is malloc'ed here
+        dataset_list = []
+        try:
+            for model, batch, indexes, shape in runs:
+                slot = model.pool.acquire(1)[0]
+                dataset_list.append([model, batch, indexes, shape, slot])
+                self.__load_input_data([images_dataset_list[i] for i in indexes], model, slot)
+                if model.dynamic == 'batch':
+                    ret = acl.mdl.set_dynamic_batch_size(model.model_id, slot.input,
+                                                         model.dynamic_index, batch)
+                    check_ret("acl.mdl.set_dynamic_batch_size", ret)
+                elif model.dynamic == 'hw':
+                    ret = acl.mdl.set_dynamic_hw_size(model.model_id, slot.input,
+                                                      model.dynamic_index,
+                                                      shape[0] // 2, shape[1] // 2)
+                    check_ret("acl.mdl.set_dynamic_hw_size", ret)
+        except Exception:
+            self.release([(run[0], run[-1]) for run in dataset_list])
+            raise
         print("[ACL] data interaction from host to device success")
-        
-        
-    def __destroy_dataset_and_databuf(self, ):
-        while self.dataset_list:
-            dataset = self.dataset_list.pop()
-            for temp in dataset:
-                num_temp = acl.mdl.get_dataset_num_buffers(temp)
-                for i in range(num_temp):
-                    data_buf_temp = acl.mdl.get_dataset_buffer(temp, i)
-                    if data_buf_temp:
-                        data = acl.get_data_buffer_addr(data_buf_temp)
-                        ret = acl.rt.free(data)
-                        check_ret("acl.rt.free", ret)
-                        ret = acl.destroy_data_buffer(data_buf_temp)
-                        check_ret("acl.destroy_data_buffer", ret)
-                ret = acl.mdl.destroy_dataset(temp)
-                check_ret("acl.mdl.destroy_dataset", ret)
+        return dataset_list
                 
                 
     def __process_callback(self, args_list):
@@ -215,108 +389,153 @@ class NET(object):
                 break
 
 
-    def __get_callback(self):
-        acl.rt.launch_callback(self.__callback_func,
-                            self.dataset_list,
-                            1,
-                            self.stream)
+    def __get_callback(self, dataset_list, future, stream):
+        ret = acl.rt.launch_callback(self.__callback_func,
+                                     [dataset_list, future],
+                                     1,
+                                     stream)
+        check_ret("acl.rt.launch_callback", ret)
         
         
-    def __forward(self):
+    def __forward(self, dataset_list, stream):
         print('[MODEL] execute stage:')
-        for img_data, infer_output in self.dataset_list:
-            ret = acl.mdl.execute_async(self.model_id,
-                                        img_data,
-                                        infer_output,
-                                        self.stream)
+        # one launch per batch, not per image, with its copies queued on
+        # the same stream around it
+        for model, batch, indexes, shape, slot in dataset_list:
+            slot.record('start', stream)
+            slot.copy_input_async(len(indexes) * model.image_bytes(shape), stream)
+            slot.record('h2d', stream)
+            ret = acl.mdl.execute_async(model.model_id,
+                                        slot.input,
+                                        slot.output,
+                                        stream)
             check_ret("acl.mdl.execute_async", ret)
-
-        self.__get_callback()
+            slot.record('compute', stream)
+            # only the rows of the images
+            slot.copy_outputs_async(slot.output_views(len(indexes), *shape), stream)
+            slot.record('d2h', stream)
         print('[MODEL] execute stage success')
         
         
-    def __callback_func(self, delete_list):
+    def __callback_func(self, args_list):
         print('[MODEL] callback func stage:')
-        j = 0
-        self.results = []
-        for temp in delete_list:
-            _, infer_output = temp
-            
-            # device to host
-            feature_maps = []
-            num = acl.mdl.get_dataset_num_buffers(infer_output)
-            for i in range(num):
-                temp_output_buf = acl.mdl.get_dataset_buffer(infer_output, i)
-
-                infer_output_ptr = acl.get_data_buffer_addr(temp_output_buf)
-                infer_output_size = acl.get_data_buffer_size_v2(temp_output_buf)
-
-                output_host, ret = acl.rt.malloc_host(infer_output_size)
-                check_ret("acl.rt.malloc_host", ret)
-                
-                ret = acl.rt.memcpy(output_host,
-                                    infer_output_size,
-                                    infer_output_ptr,
-                                    infer_output_size,
-                                    ACL_MEMCPY_DEVICE_TO_HOST)
-                check_ret("acl.rt.memcpy", ret)
-                
-                feature_maps.append((acl.util.ptr_to_numpy(output_host, (infer_output_size//4,), 
-                                    11).reshape(self.model_output_dims[i])).transpose((0, 1, 3, 4, 2)))
-                
-            res_tensor = detect(feature_maps, self.class_num)
-            
-            # Apply NMS
-            pred = non_max_suppression(res_tensor, conf_thres=0.33, iou_thres=0.5)
-            
-            # Process detections
-            bboxes = []
-            for i, det in enumerate(pred):  # detections per image
-                # Rescale boxes from img_size to im0 size
-                if det is not None:
-                    det[:, :4] = scale_coords((self.model_input_width, self.model_input_height), 
-                                            det[:, :4], self.img_dims[j]).round()
-                    for *xyxy, conf, cls in det:
-                        bboxes.append([*xyxy, conf, int(cls)])
-                else:
-                    pass
-            j += 1
-
-            self.results.append(bboxes)
-
-        self.__destroy_dataset_and_databuf()
+        dataset_list, future = args_list
+        # the outputs are in the pinned slabs of the slots, the feature
+        # maps of an image are views of its row, in the order of submit
+        slots = [(run[0], run[-1]) for run in dataset_list]
+        try:
+            feature_maps = [None] * sum(len(run[2]) for run in dataset_list)
+            for model, batch, indexes, shape, slot in dataset_list:
+                maps = slot.output_views(len(indexes), *shape)
+                for j, i in enumerate(indexes):
+                    feature_maps[i] = [m[j:j + 1] for m in maps]
+
+                # device time of the stages of the launch, from the slot events
+                self.timings.observe('h2d', slot.elapsed_ms('start', 'h2d'), len(indexes))
+                self.timings.observe('execute', slot.elapsed_ms('h2d', 'compute'), len(indexes))
+                self.timings.observe('d2h', slot.elapsed_ms('compute', 'd2h'), len(indexes))
+        except Exception as e:
+            self.release(slots)
+            future.set_exception(e)
+            return
+
+        future.set_result((feature_maps, slots))
         print('[MODEL] callback func stage success')
 
-    
-    def run(self, img_datas, img_dims):
-        if not isinstance(img_datas, list):
-            print("[ERROR] images isn't list")
-            return None
-
-        self.img_dims = img_dims
-        # copy images to device
-        self.__data_interaction(img_datas)
-
-        # thread
-        tid, ret = acl.util.start_thread(self.__process_callback,
-                                         [self.context, 50])
-        check_ret("acl.util.start_thread", ret)
 
-        ret = acl.rt.subscribe_report(tid, self.stream)
-        check_ret("acl.rt.subscribe_report", ret)
+    def release(self, slots):
+        # give back the slots returned by execute, their feature maps
+        # are overwritten by the next runs
+        for model, slot in slots:
+            model.pool.release([slot])
+
+
+    def submit(self, img_datas):
+        # copy the images to the device and launch the model, returns a
+        # future of the feature maps of every image and the slots holding
+        # them, see release. The future is done once the outputs are
+        # copied back to the host.
+        runs = self.__plan(img_datas)
+        waves = self.__waves(runs)
+
+        self.submit_lock.acquire()
+        if len(waves) > 1:
+            # the wave thread releases the lock after the last wave
+            try:
+                return self.wave_executor.submit(self.__run_waves, img_datas, waves)
+            except Exception:
+                self.submit_lock.release()
+                raise
+
+        try:
+            return self.__launch(img_datas, runs)
+        finally:
+            self.submit_lock.release()
+
+
+    def __launch(self, img_datas, runs):
+        # stage and launch the runs, submit_lock is held by the caller
+        future = Future()
+        # the caller may be another thread than the one loading the model
+        ret = acl.rt.set_context(self.context)
+        check_ret("acl.rt.set_context", ret)
+
+        # the batches take the streams in turn
+        stream = self.streams[self.next_stream]
+        self.next_stream = (self.next_stream + 1) % len(self.streams)
+
+        # stage the images, then queue the copies and the launch
+        dataset_list = self.__data_interaction(img_datas, runs)
+        try:
+            self.__forward(dataset_list, stream)
+            self.__get_callback(dataset_list, future, stream)
+        except Exception:
+            self.release([(run[0], run[-1]) for run in dataset_list])
+            raise
+
+        return future
 
-        self.__forward()
-        ret = acl.rt.synchronize_stream(self.stream)
-        check_ret("acl.rt.synchronize_stream", ret)
-        ret = acl.rt.unsubscribe_report(tid, self.stream)
-        check_ret("acl.rt.unsubscribe_report", ret)
-        
-        self.exit_flag = True
-        ret = acl.util.stop_thread(tid)
-        check_ret("acl.util.stop_thread", ret)
-        
-        return self.results
+    
+    def __run_waves(self, img_datas, waves):
+        # batches bigger than the device pools run in parts, the feature
+        # maps are copied out so every part can give its slots back. The
+        # slots of a wave are only waited for while the batches before
+        # this one are postprocessed, no batch after it is launched
+        try:
+            feature_maps = [None] * len(img_datas)
+            for runs in waves:
+                indexes = [i for run in runs for i in run[2]]
+                images = [img_datas[i] for i in indexes]
+                maps, slots = self.__launch(images, self.__plan(images)).result()
+                for i, image_maps in zip(indexes, maps):
+                    feature_maps[i] = [m.copy() for m in image_maps]
+                self.release(slots)
+        finally:
+            self.submit_lock.release()
+
+        return feature_maps, []
+
+
+    def get_max_submit_size(self):
+        # the most images of a shape launched without waves, None when
+        # the pools grow
+        sizes = []
+        for shape in self.get_input_shapes():
+            models = [model for model in self.models if shape in model.shapes]
+            model = max(models, key=lambda m: m.max_batch)
+            if model.pool.max_acquire() is not None:
+                sizes.append(model.max_batch * model.pool.max_acquire())
+        return min(sizes) if sizes else None
 
     
-    def get_model_input_dims(self):
-        return self.model_input_width, self.model_input_height
\ No newline at end of file
+    def get_max_batch_size(self):
+        return max(model.max_batch for model in self.models)
+
+
+    def get_memory_size(self):
+        return sum(model.memory_size() for model in self.models)
+
+
+    def get_input_shapes(self):
+        return sorted(set(shape for model in self.models for shape in model.shapes),
+                      key=lambda s: (s[0] * s[1], s))
@@ -0,0 +1,219 @@
+"""
+This script provide the interface of the inference backends of
+pyacl_app and the factory selecting one from the configurations
+
+Copyright 2022 Huawei Technologies Co., Ltd
+
+Backends:
+  acl  : model/acl.py NET, OM models on an Ascend NPU
+  onnx : model/onnx_backend.py OnnxNET, the exported ONNX model on
+         the CPU with ONNX Runtime, runs without an Ascend card
+  sim  : model/sim_backend.py SimNET, no model, empty feature maps after
+         the latency of a NPU, to load test the rest of the server
+
+A backend loads the model, submit() runs a batch of preprocessed images
+and returns a future of their feature maps in the (1, 3, ny, nx, c)
+layout of detect, postprocess() turns them into boxes. A model may take
+several input shapes, each image is letterboxed in one of them and the
+boxes are mapped back with the ratio_pad of its letterbox. The
+backends time their stages, by batch size, in "timings".
+
+CREATED:  2026-10-18 20:31:26
+MODIFIED: 2026-10-19 13:06:40
+"""
+# -*- coding:utf-8 -*-
+from os import path
+from time import perf_counter
+from utils.metrics import StageTimings, elapsed_ms
+from utils.letterbox import letterbox_plan
+from utils.postprocessing import detect, non_max_suppression, \
+                                scale_coords
+
+
+BACKENDS = ('acl', 'onnx', 'sim')
+
+# strides of the outputs of the model, ny = h / stride
+STRIDES = (8, 16, 32)
+
+
+class Backend(object):
+    def __init__(self):
+        self.model_input_width = 0
+        self.model_input_height = 0
+        self.model_output_dims = []
+        self.class_num = 0  # outputs per anchor, 5 + classes
+        self.timings = StageTimings()
+
+
+    def submit(self, img_datas):
+        # run the images, returns a future of (feature maps of every
+        # image, resources holding them), see release
+        raise NotImplementedError
+
+
+    def release(self, slots):
+        # give back what holds the feature maps returned by submit
+        pass
+
+
+    def execute(self, img_datas):
+        if not isinstance(img_datas, list):
+            print("[ERROR] images isn't list")
+            return None
+
+        return self.submit(img_datas).result()
+
+
+    def postprocess(self, feature_maps_list, img_dims, ratio_pads=None):
+        # detect, NMS and rescale the boxes of every image, it only runs
+        # on the host so it can overlap with the next execute. The
+        # ratio_pad of an image missing in ratio_pads comes from its plan
+        results = []
+        times = {'detect': 0.0, 'nms': 0.0, 'scale_coords': 0.0}
+        for j, feature_maps in enumerate(feature_maps_list):
+            # the input shape the image was letterboxed in
+            _, _, ny, nx, _ = feature_maps[0].shape
+            input_shape = ny * STRIDES[0], nx * STRIDES[0]
+            start = perf_counter()
+            res_tensor = detect(feature_maps, self.class_num)
+            times['detect'] += elapsed_ms(start)
+
+            # Apply NMS
+            start = perf_counter()
+            pred = non_max_suppression(res_tensor, conf_thres=0.33, iou_thres=0.5)
+            times['nms'] += elapsed_ms(start)
+
+            # Process detections
+            start = perf_counter()
+            bboxes = []
+            for i, det in enumerate(pred):  # detections per image
+                # Rescale boxes from img_size to im0 size
+                if det is not None:
+                    ratio_pad = ratio_pads[j] if ratio_pads and ratio_pads[j] else \
+                                letterbox_plan(img_dims[j], input_shape)[2]
+                    det[:, :4] = scale_coords(input_shape, det[:, :4], img_dims[j],
+                                              ratio_pad).round()
+                    for *xyxy, conf, cls in det:
+                        bboxes.append([*xyxy, conf, int(cls)])
+                else:
+                    pass
+            times['scale_coords'] += elapsed_ms(start)
+
+            results.append(bboxes)
+
+        # the time of the whole batch
+        for stage, ms in times.items():
+            self.timings.observe(stage, ms, len(feature_maps_list))
+        return results
+
+
+    def run(self, img_datas, img_dims, ratio_pads=None):
+        res = self.execute(img_datas)
+        if res is None:
+            return None
+
+        feature_maps_list, slots = res
+        try:
+            return self.postprocess(feature_maps_list, img_dims, ratio_pads)
+        finally:
+            self.release(slots)
+
+
+    def snapshot(self):
+        return self.timings.snapshot()
+
+
+    def get_max_batch_size(self):
+        # the most images one launch of the model holds
+        raise NotImplementedError
+
+
+    def get_max_submit_size(self):
+        # the most images of one submit running at full speed, the
+        # batches of the worker are kept to it, None for no limit
+        return None
+
+
+    def get_model_input_dims(self):
+        return self.model_input_width, self.model_input_height
+
+
+    def get_memory_size(self):
+        # device bytes the loaded model holds, for the model registry
+        return 0
+
+
+    def close(self):
+        # free the model, the backend is not used anymore
+        pass
+
+
+    def get_input_shapes(self):
+        # the (h, w) input shapes of the model, the largest is the one of
+        # get_model_input_dims
+        return [(self.model_input_height, self.model_input_width)]
+
+
+def parse_shapes(text):
+    # "640x640, 384x640" to [(h, w)], the shapes are written width x height
+    shapes = []
+    for item in text.split(','):
+        if item.strip():
+            w, h = (int(i) for i in item.lower().split('x'))
+            shapes.append((h, w))
+    return shapes
+
+
+def configured_input_dims(cfg):
+    # the (w, h) and (h, w) input shapes of the model of the [model]
+    # section as get_model_input_dims and get_input_shapes give them,
+    # read from the configurations without loading the model, None if
+    # they are not configured
+    if cfg.get('model', 'backend') == 'sim':
+        w, h = cfg.getint('sim', 'width'), cfg.getint('sim', 'height')
+        shapes = parse_shapes(cfg.get('sim', 'shapes', fallback='')) + [(h, w)]
+    else:
+        shapes = parse_shapes(cfg.get('model', 'input_shapes', fallback=''))
+        if not shapes:
+            return None
+        h, w = max(shapes, key=lambda s: (s[0] * s[1], s))
+
+    return (w, h), sorted(set(shapes), key=lambda s: (s[0] * s[1], s))
+
+
+def make_backend(cfg):
+    # load the model of the backend selected in the [model] section, the
+    # backend modules are imported here so acl is only needed by "acl"
+    backend = cfg.get('model', 'backend')
+    if backend == 'acl':
+        from model.acl import NET
+
+        device_id = cfg.getint('npu', 'device_id')
+        print("[INFO] using NPU-%d . . ."% device_id)
+        model_path = [path.abspath(p.strip()) for p in cfg.get('model', 'path').split(',')]
+        return NET(device_id, model_path,
+                   cfg.getint('npu', 'pool_size'),
+                   cfg.get('npu', 'pool_policy'),
+                   cfg.getint('npu', 'streams'))
+
+    if backend == 'onnx':
+        from model.onnx_backend import OnnxNET
+
+        print("[INFO] using the CPU . . .")
+        return OnnxNET(path.abspath(cfg.get('cpu', 'path')),
+                       cfg.getint('model', 'batch_size'),
+                       cfg.getint('cpu', 'threads'))
+
+    if backend == 'sim':
+        from model.sim_backend import SimNET
+
+        print("[INFO] using a simulated NPU . . .")
+        return SimNET(cfg.getint('sim', 'width'), cfg.getint('sim', 'height'),
+                      cfg.getint('sim', 'classes'), cfg.getint('model', 'batch_size'),
+                      cfg.getfloat('sim', 'latency_ms'),
+                      cfg.getfloat('sim', 'latency_per_image_ms'),
+                      cfg.getfloat('sim', 'jitter_ms'),
+                      cfg.getint('sim', 'concurrency'),
+                      parse_shapes(cfg.get('sim', 'shapes', fallback='')))
+
+    raise ValueError("model backend must be one of %s" % (BACKENDS,))
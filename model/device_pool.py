@@ -0,0 +1,213 @@
+"""
+This script provide a pool of model input/output datasets allocated
+once on the device and reused by every run of the model, each slot
+also owns pinned host buffers its input is staged in and its outputs
+are copied back to, and the events timing its copies and launch
+
+Copyright 2022 Huawei Technologies Co., Ltd
+
+A run that needs more slots than are free follows the pool policy:
+  block  : wait until other runs give their slots back
+  grow   : allocate the missing slots, they stay in the pool
+  reject : raise PoolExhausted
+
+CREATED:  2026-10-18 16:55:12
+MODIFIED: 2026-10-18 21:52:10
+"""
+# -*- coding:utf-8 -*-
+import acl
+import numpy as np
+
+from threading import Condition
+from utils.acl_util import check_ret
+from model.backend import STRIDES
+from data.constant import ACL_MEM_MALLOC_NORMAL_ONLY, \
+    ACL_MEMCPY_HOST_TO_DEVICE, ACL_MEMCPY_DEVICE_TO_HOST
+
+
+POLICIES = ('block', 'grow', 'reject')
+
+# acl.util.ptr_to_numpy types
+NPY_UINT8 = 2
+NPY_FLOAT32 = 11
+
+# events recorded around the copies and the launch of a slot
+EVENTS = ('start', 'h2d', 'compute', 'd2h')
+
+
+class PoolExhausted(Exception):
+    pass
+
+
+class DeviceSlot(object):
+    # one model input dataset and one output dataset with their buffers
+    def __init__(self, model_desc, input_num, output_num):
+        self.input, self.input_ptrs, self.input_sizes = \
+            self.__create_dataset([acl.mdl.get_input_size_by_index(model_desc, i)
+                                   for i in range(input_num)])
+        self.output, self.output_ptrs, self.output_sizes = \
+            self.__create_dataset([acl.mdl.get_output_size_by_index(model_desc, i)
+                                   for i in range(output_num)])
+
+        # pinned host slab the input is staged in, async copies need it
+        self.host_input_ptr, ret = acl.rt.malloc_host(self.input_sizes[0])
+        check_ret("acl.rt.malloc_host", ret)
+        self.host_input = acl.util.ptr_to_numpy(self.host_input_ptr,
+                                                (self.input_sizes[0],), NPY_UINT8)
+
+        # one pinned host slab per output, the outputs of a run of any
+        # batch size and input shape are at the start of the slab
+        self.host_ptrs = []
+        self.host_outputs = []
+        self.output_dims = []
+        for i, size in enumerate(self.output_sizes):
+            ptr, ret = acl.rt.malloc_host(size)
+            check_ret("acl.rt.malloc_host", ret)
+            self.host_ptrs.append(ptr)
+            self.host_outputs.append(acl.util.ptr_to_numpy(ptr, (size // 4,), NPY_FLOAT32))
+            self.output_dims.append(tuple(acl.mdl.get_output_dims(model_desc, i)[0]['dims']))
+
+        self.events = {}
+        for name in EVENTS:
+            self.events[name], ret = acl.rt.create_event()
+            check_ret("acl.rt.create_event", ret)
+
+
+    def record(self, name, stream):
+        ret = acl.rt.record_event(self.events[name], stream)
+        check_ret("acl.rt.record_event", ret)
+
+
+    def elapsed_ms(self, start, end):
+        # device time between two recorded events, once they are reached
+        ms, ret = acl.rt.event_elapsed_time(self.events[start], self.events[end])
+        check_ret("acl.rt.event_elapsed_time", ret)
+        return ms
+
+
+    def copy_input_async(self, size, stream):
+        # host to device of the first "size" bytes of the staged input
+        ret = acl.rt.memcpy_async(self.input_ptrs[0], self.input_sizes[0], self.host_input_ptr,
+                                  size, ACL_MEMCPY_HOST_TO_DEVICE, stream)
+        check_ret("acl.rt.memcpy_async", ret)
+
+
+    def output_views(self, rows, height, width):
+        # the outputs of "rows" images of a (height, width) input, views
+        # of the host slabs in the (rows, 3, ny, nx, c) layout of detect
+        views = []
+        for host, dims, stride in zip(self.host_outputs, self.output_dims, STRIDES):
+            shape = (rows, dims[1], dims[2], height // stride, width // stride)
+            views.append(host[:int(np.prod(shape))].reshape(shape).transpose((0, 1, 3, 4, 2)))
+        return views
+
+
+    def copy_outputs_async(self, views, stream):
+        # device to host of the rows of the output views, the views are
+        # valid once the stream reaches it and until the slot is released
+        for dev_ptr, host_ptr, size, view in zip(self.output_ptrs, self.host_ptrs,
+                                                 self.output_sizes, views):
+            ret = acl.rt.memcpy_async(host_ptr, size, dev_ptr, view.nbytes,
+                                      ACL_MEMCPY_DEVICE_TO_HOST, stream)
+            check_ret("acl.rt.memcpy_async", ret)
+
+
+    def __create_dataset(self, sizes):
+        dataset = acl.mdl.create_dataset()
+        ptrs = []
+        for size in sizes:
+            ptr, ret = acl.rt.malloc(size, ACL_MEM_MALLOC_NORMAL_ONLY)
+            check_ret("acl.rt.malloc", ret)
+
+            data_buf = acl.create_data_buffer(ptr, size)
+            if data_buf is None:
+                raise Exception("acl.create_data_buffer failed")
+            _, ret = acl.mdl.add_dataset_buffer(dataset, data_buf)
+            check_ret("acl.mdl.add_dataset_buffer", ret)
+            ptrs.append(ptr)
+
+        return dataset, ptrs, sizes
+
+
+    def destroy(self):
+        for dataset in (self.input, self.output):
+            for i in range(acl.mdl.get_dataset_num_buffers(dataset)):
+                data_buf = acl.mdl.get_dataset_buffer(dataset, i)
+                ret = acl.rt.free(acl.get_data_buffer_addr(data_buf))
+                check_ret("acl.rt.free", ret)
+                ret = acl.destroy_data_buffer(data_buf)
+                check_ret("acl.destroy_data_buffer", ret)
+            ret = acl.mdl.destroy_dataset(dataset)
+            check_ret("acl.mdl.destroy_dataset", ret)
+
+        self.host_outputs = []
+        while self.host_ptrs:
+            ret = acl.rt.free_host(self.host_ptrs.pop())
+            check_ret("acl.rt.free_host", ret)
+
+        self.host_input = None
+        if self.host_input_ptr:
+            ret = acl.rt.free_host(self.host_input_ptr)
+            check_ret("acl.rt.free_host", ret)
+            self.host_input_ptr = None
+
+        while self.events:
+            ret = acl.rt.destroy_event(self.events.popitem()[1])
+            check_ret("acl.rt.destroy_event", ret)
+
+
+class DevicePool(object):
+    def __init__(self, model_desc, size, policy='block'):
+        if policy not in POLICIES:
+            raise ValueError("pool policy must be one of %s" % (POLICIES,))
+
+        self.model_desc = model_desc
+        self.input_num = acl.mdl.get_num_inputs(model_desc)
+        self.output_num = acl.mdl.get_num_outputs(model_desc)
+        self.policy = policy
+
+        self.cond = Condition()
+        self.slots = [self.__new_slot() for _ in range(size)]
+        self.free = list(self.slots)
+        print("[ACL] device pool of %d slots, policy %s"% (size, policy))
+
+
+    def __new_slot(self):
+        return DeviceSlot(self.model_desc, self.input_num, self.output_num)
+
+
+    def max_acquire(self):
+        # the most slots one run may take at once
+        return None if self.policy == 'grow' else len(self.slots)
+
+
+    def acquire(self, n):
+        with self.cond:
+            if len(self.free) < n:
+                if self.policy == 'reject':
+                    raise PoolExhausted("%d slots asked, %d free" % (n, len(self.free)))
+                if self.policy == 'grow':
+                    for _ in range(n - len(self.free)):
+                        slot = self.__new_slot()
+                        self.slots.append(slot)
+                        self.free.append(slot)
+                    print("[ACL] device pool grown to %d slots"% len(self.slots))
+                if n > len(self.slots):
+                    raise PoolExhausted("%d slots asked, pool has %d" % (n, len(self.slots)))
+                self.cond.wait_for(lambda: len(self.free) >= n)
+
+            slots, self.free = self.free[:n], self.free[n:]
+            return slots
+
+
+    def release(self, slots):
+        with self.cond:
+            self.free += slots
+            self.cond.notify_all()
+
+
+    def destroy(self):
+        with self.cond:
+            while self.slots:
+                self.slots.pop().destroy()
+            self.free = []
@@ -0,0 +1,91 @@
+"""
+This script provide the CPU reference backend, it runs the ONNX model
+exported by utils/onnx_exporter with ONNX Runtime
+
+Copyright 2022 Huawei Technologies Co., Ltd
+
+The model takes the focused (N, 12, H/2, W/2) input of preprocess like
+the OM model. With a static batch size the batches run in parts of that
+size, the remainder is padded with zeros.
+
+CREATED:  2026-10-18 20:31:26
+MODIFIED: 2026-10-18 22:40:05
+"""
+# -*- coding:utf-8 -*-
+import numpy as np
+
+from time import perf_counter
+from concurrent.futures import ThreadPoolExecutor
+from utils.metrics import elapsed_ms
+from model.backend import Backend
+
+try:
+    import onnxruntime
+except ImportError:
+    onnxruntime = None
+
+
+class OnnxNET(Backend):
+    def __init__(self, model_path, max_batch_size, threads=0):
+        Backend.__init__(self)
+        if onnxruntime is None:
+            raise ImportError("the onnx backend needs onnxruntime, pip install onnxruntime")
+
+        self.model_path = model_path  # string
+
+        # "threads" 0 lets ONNX Runtime use all the cores
+        options = onnxruntime.SessionOptions()
+        options.intra_op_num_threads = threads
+        self.session = onnxruntime.InferenceSession(model_path, options,
+                                                    providers=['CPUExecutionProvider'])
+        print("[MODEL] %s on %s"% (model_path, onnxruntime.get_device()))
+
+        model_input = self.session.get_inputs()[0]
+        self.input_name = model_input.name
+        print("model input dims", model_input.shape)
+        if not all(isinstance(d, int) for d in model_input.shape[1:]):
+            raise ValueError("%s must have a static input height and width" % model_path)
+        self.model_input_height, self.model_input_width = (i * 2 for i in model_input.shape[2:])
+        # a symbolic batch dim is dynamic
+        self.batch = model_input.shape[0] if isinstance(model_input.shape[0], int) else None
+        self.max_batch_size = self.batch or max_batch_size
+
+        self.model_output_dims = [tuple(o.shape) for o in self.session.get_outputs()]
+        print("model output dims", self.model_output_dims)
+        # the outputs are (bs, 3, ny, nx, c) when the exporter kept the
+        # Transpose of Detect, else (bs, 3, c, ny, nx) like the OM model,
+        # "c" is the same for every output and the grids are not
+        last = set(d[-1] for d in self.model_output_dims)
+        self.channels_last = len(last) == 1 and len(self.model_output_dims) > 1
+        self.class_num = self.model_output_dims[0][-1 if self.channels_last else 2]
+
+        # one run at a time, the next batch waits in the executor
+        self.executor = ThreadPoolExecutor(1)
+
+
+    def __run(self, img_datas):
+        # returns the feature maps of every image
+        n = len(img_datas)
+        images = np.concatenate(img_datas)
+        if self.batch and n % self.batch:
+            pad = np.zeros((self.batch - n % self.batch,) + images.shape[1:], images.dtype)
+            images = np.concatenate([images, pad])
+
+        step = self.batch or len(images)
+        start = perf_counter()
+        outputs = [self.session.run(None, {self.input_name: images[i:i + step]})
+                   for i in range(0, len(images), step)]
+        self.timings.observe('execute', elapsed_ms(start), n)
+        outputs = [np.concatenate(maps) for maps in zip(*outputs)]
+        if not self.channels_last:
+            outputs = [m.transpose((0, 1, 3, 4, 2)) for m in outputs]
+
+        return [[m[j:j + 1] for m in outputs] for j in range(n)], []
+
+
+    def submit(self, img_datas):
+        return self.executor.submit(self.__run, img_datas)
+
+
+    def get_max_batch_size(self):
+        return self.max_batch_size
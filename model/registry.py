@@ -0,0 +1,175 @@
+"""
+This script provide the registry of the models served by one worker,
+the models share the device, are loaded on first use and the least
+recently used idle ones are unloaded when a model does not fit in the
+device memory budget
+
+Copyright 2022 Huawei Technologies Co., Ltd
+
+The models are listed in [registry] models, the first one is the default
+of the api. A "[<section>:<model>]" section overrides the keys of the
+"[<section>]" section for one model, e.g. [model:yolov5m] path or
+[batching:yolov5m] max_queue_delay_ms. The redis keys of the default
+model are the ones of a single model server, the keys of the others end
+with ":<model>".
+
+CREATED:  2026-10-18 22:14:37
+MODIFIED: 2026-10-18 22:14:37
+"""
+# -*- coding:utf-8 -*-
+from time import time
+from threading import Condition
+from configparser import ConfigParser
+from utils.metrics import Counters
+from model.backend import make_backend
+
+
+def model_names(cfg):
+    # the served models, the default one first
+    names = [n.strip() for n in cfg.get('registry', 'models', fallback='').split(',')
+             if n.strip()]
+    return names or ['default']
+
+
+def model_key(cfg, key):
+    # redis key "key" of the model of a model_config
+    name = cfg.get('registry', 'name', fallback=None)
+    if name is None or name == model_names(cfg)[0]:
+        return key
+    return "%s:%s" % (key, name)
+
+
+def model_config(cfg, name):
+    # copy of the configurations with the sections of model "name"
+    # overridden, and the queue of the model
+    model_cfg = ConfigParser()
+    model_cfg.read_dict(dict((s, dict(cfg.items(s, raw=True))) for s in cfg.sections()
+                             if ':' not in s))
+    for section in cfg.sections():
+        base, _, model = section.partition(':')
+        if model == name:
+            if not model_cfg.has_section(base):
+                model_cfg.add_section(base)
+            for key, value in cfg.items(section, raw=True):
+                model_cfg.set(base, key, value)
+
+    if not model_cfg.has_section('registry'):
+        model_cfg.add_section('registry')
+    model_cfg.set('registry', 'name', name)
+    model_cfg.set('queue', 'name', model_key(model_cfg, model_cfg.get('queue', 'name')))
+    return model_cfg
+
+
+class ModelRegistry(object):
+    def __init__(self, cfg, memory_budget_mb=0):
+        self.names = model_names(cfg)
+        self.configs = dict((name, model_config(cfg, name)) for name in self.names)
+        self.budget = int(memory_budget_mb * 1024 * 1024)  # 0 is no limit
+
+        self.cond = Condition()
+        self.models = {}     # loaded backends
+        self.sizes = {}      # device bytes of the models loaded once
+        self.users = {}      # batches in flight per model
+        self.last_used = {}
+        self.loading = set()
+        self.metrics = Counters()
+
+
+    def __used(self):
+        return sum(self.sizes.get(name, 0) for name in set(self.models) | self.loading)
+
+
+    def __evict(self, size):
+        # unload idle models, least recently used first, until "size"
+        # more bytes fit in the budget, False when the models in use
+        # do not leave enough. A model bigger than the budget still
+        # loads alone
+        if not self.budget:
+            return True
+
+        busy = sum(self.sizes.get(name, 0) for name in self.loading) + \
+               sum(self.sizes.get(name, 0) for name in self.models if self.users.get(name))
+        if busy and busy + size > self.budget:
+            return False
+
+        while self.models and self.__used() + size > self.budget:
+            idle = [name for name in self.models if not self.users.get(name)]
+            self.__unload(min(idle, key=lambda name: self.last_used.get(name, 0)))
+            self.metrics.inc('evictions')
+        return True
+
+
+    def __unload(self, name):
+        print("[INFO] unloading model %s . . ."% name)
+        self.models.pop(name).close()
+
+
+    def acquire(self, name):
+        # the backend of model "name", loaded if needed, it stays loaded
+        # until the matching release
+        with self.cond:
+            if name not in self.configs:
+                raise KeyError("unknown model %s" % name)
+
+            while True:
+                if name in self.models:
+                    self.users[name] = self.users.get(name, 0) + 1
+                    self.last_used[name] = time()
+                    return self.models[name]
+                # another thread loads it or the budget is held by the
+                # models in use
+                if name not in self.loading and self.__evict(self.sizes.get(name, 0)):
+                    self.loading.add(name)
+                    break
+                self.cond.wait()
+
+        # load without the lock, the other models keep running
+        print("[INFO] loading model %s . . ."% name)
+        try:
+            backend = make_backend(self.configs[name])
+        except Exception:
+            with self.cond:
+                self.loading.discard(name)
+                self.cond.notify_all()
+            raise
+
+        with self.cond:
+            self.loading.discard(name)
+            self.models[name] = backend
+            self.sizes[name] = backend.get_memory_size()
+            self.users[name] = self.users.get(name, 0) + 1
+            self.last_used[name] = time()
+            self.metrics.inc('loads')
+            # the size of a first load is only known now
+            self.__evict(0)
+            self.cond.notify_all()
+            return backend
+
+
+    def release(self, name):
+        with self.cond:
+            self.users[name] -= 1
+            self.cond.notify_all()
+
+
+    def unload(self, name):
+        # unload model "name" if it is loaded and idle
+        with self.cond:
+            if name in self.models and not self.users.get(name):
+                self.__unload(name)
+                self.cond.notify_all()
+
+
+    def peek(self, name):
+        # the backend of model "name" if it is loaded, without holding it
+        with self.cond:
+            return self.models.get(name)
+
+
+    def snapshot(self):
+        with self.cond:
+            state = {'loaded': sorted(self.models),
+                     'memory_mb': self.__used() / (1024.0 * 1024.0),
+                     'budget_mb': self.budget / (1024.0 * 1024.0)}
+        state.update(self.metrics.snapshot())
+        return state
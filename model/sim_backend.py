@@ -0,0 +1,97 @@
+"""
+This script provide the simulated NPU backend, it answers with feature
+maps of the YOLO output shapes after the latency of a batch on a device
+
+Copyright 2022 Huawei Technologies Co., Ltd
+
+The latency of a batch of n images is latency_ms + n * latency_per_image_ms
+plus a normal jitter of jitter_ms deviation. At most "concurrency" batches
+run at once, the others wait for the device like on a NPU. The feature
+maps have no detections, postprocess still does the detect and NMS work.
+The model may take several (h, w) input shapes like a dynamic image size
+OM model, width x height is the largest.
+
+CREATED:  2026-10-18 21:05:49
+MODIFIED: 2026-10-19 13:06:40
+"""
+# -*- coding:utf-8 -*-
+import numpy as np
+
+from time import sleep
+from random import gauss
+from concurrent.futures import ThreadPoolExecutor
+from model.backend import Backend, STRIDES
+
+
+ANCHORS = 3
+
+
+class SimNET(Backend):
+    def __init__(self, width, height, classes, max_batch_size, latency_ms,
+                 latency_per_image_ms, jitter_ms=0, concurrency=1, shapes=None):
+        Backend.__init__(self)
+        self.model_input_width = width
+        self.model_input_height = height
+        self.shapes = sorted(set(shapes or []) | {(height, width)},
+                             key=lambda s: (s[0] * s[1], s))
+        self.class_num = 5 + classes
+        self.max_batch_size = max_batch_size
+
+        self.latency_ms = latency_ms
+        self.latency_per_image_ms = latency_per_image_ms
+        self.jitter_ms = jitter_ms
+
+        # the (bs, 3, c, ny, nx) outputs of the OM model
+        self.model_output_dims = [(max_batch_size, ANCHORS, self.class_num, height // s, width // s)
+                                  for s in STRIDES]
+        # feature maps of a full batch of every shape in the layout of
+        # detect, shared by all the batches so they are read only, the
+        # logits are so low that no box passes the confidence threshold
+        self.feature_maps = {}
+        for h, w in self.shapes:
+            self.feature_maps[(h, w)] = []
+            for s in STRIDES:
+                maps = np.full((max_batch_size, ANCHORS, h // s, w // s, self.class_num), -10,
+                               dtype=np.float32)
+                maps.flags.writeable = False
+                self.feature_maps[(h, w)].append(maps)
+
+        self.executor = ThreadPoolExecutor(concurrency)
+        print("[MODEL] simulated %dx%d model, %.2f + %.2f * n ms, %d at once"
+              % (width, height, latency_ms, latency_per_image_ms, concurrency))
+
+
+    def __run(self, shapes):
+        n = len(shapes)
+        latency = max(0.0, self.latency_ms + n * self.latency_per_image_ms +
+                      (gauss(0, self.jitter_ms) if self.jitter_ms else 0))
+        sleep(latency / 1000.0)
+        self.timings.observe('execute', latency, n)
+
+        return [[m[j:j + 1] for m in self.feature_maps[shape]]
+                for j, shape in enumerate(shapes)], []
+
+
+    def submit(self, img_datas):
+        if len(img_datas) > self.max_batch_size:
+            raise ValueError("%d images, the model holds %d" % (len(img_datas), self.max_batch_size))
+
+        # the (h, w) shapes of the focused images
+        shapes = [(d.shape[2] * 2, d.shape[3] * 2) for d in img_datas]
+        for shape in set(shapes):
+            if shape not in self.feature_maps:
+                raise ValueError("no %dx%d input in the model" % shape)
+
+        return self.executor.submit(self.__run, shapes)
+
+
+    def get_max_batch_size(self):
+        return self.max_batch_size
+
+
+    def get_max_submit_size(self):
+        return self.max_batch_size
+
+
+    def get_input_shapes(self):
+        return self.shapes
@@ -1,126 +1,540 @@
-"""
-Redis server, it is used to run 
-pyacl model asynchronously through redis 
-
-Copyright 2022 Huawei Technologies Co., Ltd
-
-CREATED:  2022-02-05 15:12:13
-MODIFIED: 2022-02-10 01:48:45
-"""
-# -*- coding:utf-8 -*-
-import numpy as np
-import warnings
-
-from os import path
-from time import sleep
-from model.acl import NET
-from sys import version_info
-from json import dumps, loads
-from redis import StrictRedis
-from base64 import decodestring
-from configparser import ConfigParser
-
-
-class RunNet(object):
-    def __init__(self):
-        self.model = None
-        self.cfg = None
-        self.redis_db = None
-        
-        self.__init_resource__()
-
-    
-    def __init_resource__(self):
-        # ignore python warnings
-        warnings.filterwarnings("ignore")
-        
-        # define configurations
-        print("[INFO] loading configurations . . .")
-        self.cfg = ConfigParser()
-        self.cfg.read(path.abspath('./data/app.cfg'))
-
-        # connect to Redis server
-        self.redis_db = StrictRedis(host=self.cfg.get('db-server', 'host'),
-                                    port=self.cfg.getint('db-server', 'port'), 
-                                    db=self.cfg.getint('db-server', 'db_num'))
-        
-        # initialize models
-        device_id = self.cfg.getint('npu', 'device_id')
-        print("[INFO] using NPU-%d . . ."% device_id)
-        model_path = path.abspath(self.cfg.get('model', 'path'))
-        self.model = NET(device_id, model_path) # load model
-        print("[INFO] type of the model ", str(type(self.model)))
-        
-        # serialize model input info from getting pyacl model
-        w, h = self.model.get_model_input_dims()
-        d_model_input_dims = {'w': w, 'h': h}
-        self.redis_db.rpush('model_input_dims', dumps(d_model_input_dims))
-
-
-    def __base64_decode_image(self, a, dtype, shape):
-        # if this is Python 3, we need the extra step of encoding the
-        # serialized NumPy string as a byte object
-        if version_info.major == 3:
-            a = bytes(a, encoding="utf-8")
-            
-        # convert the string to a NumPy array using the supplied data
-        # type and target shape
-        a = np.frombuffer(decodestring(a), dtype=dtype)
-        a = a.reshape(tuple(shape))
-        
-        # return the decoded image
-        return a
-
-    
-    def model_process(self):
-        # continually pool for new images to process
-        while True:
-            # attempt to grab a batch of images from the database, then
-            # initialize the image IDs and batch of images themselves
-            queue = self.redis_db.lrange('model_img_queue', 0, 
-                    self.cfg.getint('model', 'batch_size') - 1)
-            
-            images = []
-            imageIDs = []
-            imageDims = []
-            # loop over the queue
-            for q in queue:
-                # deserialize the object and obtain the input image
-                q = loads(q.decode("utf-8"))
-                image = self.__base64_decode_image(q["img"], self.cfg.get('model', 'dtype'),
-                                                    q["img_np_dims"])
-                
-                # update list of image dims
-                imageDims.append(q["img_dims"])
-                # update list of image
-                images.append(image)
-                # update the list of image IDs
-                imageIDs.append(q["id"])
-            
-            # output = []
-            # check to see if we need to process the batch
-            if len(imageIDs) > 0:
-                # classify the batch
-                results = self.model.run(images, imageDims)
-                
-                # loop over the image IDs and their corresponding set of
-                # results from our model
-                for (imageID, result) in zip(imageIDs, results):
-                    # initialize the list of output predictions
-                    r = {"bboxes": str(result)}
-                    
-                    # store the output predictions in the database, using
-                    # the image ID as the key so we can fetch the results
-                    self.redis_db.set(imageID, dumps(r))
-                    
-                # remove the set of images from our queue
-                self.redis_db.ltrim('model_img_queue', len(imageIDs), -1)
-                
-            # sleep for a small amount
-            sleep(self.cfg.getfloat('test', 'sleep'))
-
-
-# pyacl_app main
-if __name__ == "__main__":
-    runNet = RunNet()
+"""
+Redis server, it is used to run 
+pyacl model asynchronously through redis 
+
+Copyright 2022 Huawei Technologies Co., Ltd
+
+Every model of the registry has its own queue, batcher and pipeline,
+the models are loaded on the device when their batches come.
+
+CREATED:  2022-02-05 15:12:13
+MODIFIED: 2026-10-19 13:06:40
+"""
+# -*- coding:utf-8 -*-
+import warnings
+import numpy as np
+
+from os import path
+from threading import Event
+from time import time, perf_counter
+from utils import codec
+from functools import partial
+from traceback import format_exc
+from model.registry import ModelRegistry, model_key
+from model.backend import configured_input_dims
+from json import dumps
+from redis import StrictRedis
+from utils.shm_ring import ShmRing, announcement, attach_ring
+from utils.batcher import DynamicBatcher
+from utils.pipeline import Pipeline
+from utils.admission import publish_worker_stats, STATS_KEY
+from utils.metrics import StageTimings, elapsed_ms, publish_worker_metrics
+from utils.redis_queue import make_queue, push_replies, set_replies, cancelled, worker_name
+from configparser import ConfigParser
+from concurrent.futures import ThreadPoolExecutor
+from utils.threads import limit_threads
+from utils.preprocessing import preprocess_batch
+
+
+class RunNet(object):
+    def __init__(self):
+        self.registry = None
+        self.runners = []
+        self.cfg = None
+        self.redis_db = None
+        self.shm_ring = None
+        self.replaced_ring = None
+        self.preprocess_pool = None
+        
+        self.__init_resource__()
+
+    
+    def __init_resource__(self):
+        # ignore python warnings
+        warnings.filterwarnings("ignore")
+        
+        # define configurations
+        print("[INFO] loading configurations . . .")
+        self.cfg = ConfigParser()
+        self.cfg.read(path.abspath('./data/app.cfg'))
+
+        # connect to Redis server
+        self.redis_db = StrictRedis(host=self.cfg.get('db-server', 'host'),
+                                    port=self.cfg.getint('db-server', 'port'), 
+                                    db=self.cfg.getint('db-server', 'db_num'))
+
+        # the models served by the worker, on the device under the budget
+        self.registry = ModelRegistry(self.cfg, self.cfg.getfloat('registry', 'device_memory_mb'))
+        preload = [n.strip() for n in self.cfg.get('registry', 'preload').split(',')]
+
+        slot_size = 0
+        for name in self.registry.names:
+            runner = self.__init_runner(name, name in preload)
+            self.runners.append(runner)
+            # one model input of the largest shape per shared memory slot
+            w, h, shapes = runner["dims"]
+            slot_size = max(slot_size, 3 * max(sh * sw for sh, sw in shapes) *
+                            np.dtype(runner["cfg"].get('model', 'dtype')).itemsize)
+
+        # create the shared memory ring, one slot holds one model input
+        if self.cfg.get('transport', 'mode') == 'shm':
+            self.shm_ring = ShmRing(self.cfg.get('transport', 'shm_name'),
+                                    self.cfg.getint('transport', 'shm_slots'),
+                                    slot_size, create=True)
+            if self.shm_ring.owner:
+                self.shm_ring.publish(self.redis_db)
+            else:
+                info = announcement(self.redis_db, self.shm_ring.name) or {}
+                self.shm_ring.generation = info.get('generation')
+            print("[INFO] shared memory ring %s with %d slots"% 
+                  (self.shm_ring.name, self.shm_ring.slots))
+
+        # uploaded images are decoded and preprocessed by a pool of threads,
+        # cv2 releases the GIL so they run on all the cores, each thread
+        # keeps to the cv2 and BLAS threads of the limits
+        limit_threads(self.cfg.getint('transport', 'cv2_threads'),
+                      self.cfg.getint('transport', 'blas_threads'))
+        self.preprocess_pool = ThreadPoolExecutor(self.cfg.getint('transport', 'preprocess_workers'))
+
+
+    def __init_runner(self, name, preload):
+        # the queue, batcher and stats of model "name"
+        cfg = self.registry.configs[name]
+        runner = {"name": name, "cfg": cfg, "pipeline": None,
+                  "service_rate": None, "stats_published": 0.0}
+
+        # connect to the work queue shared with the other workers
+        runner["queue"] = make_queue(self.redis_db, cfg, partial(self.__drop_entries, runner),
+                                     legacy=name == self.registry.names[0])
+
+        # collect the queued images into batches, the images of an input
+        # shape run together, the ones nobody waits for anymore are left
+        # out as they are read
+        preferred = cfg.get('batching', 'preferred_batch_sizes')
+        runner["batcher"] = DynamicBatcher(runner["queue"], cfg.getint('model', 'batch_size'),
+                                           cfg.getfloat('batching', 'max_queue_delay_ms'),
+                                           [int(s) for s in preferred.split(',') if s.strip()],
+                                           cfg.getfloat('batching', 'latency_budget_ms'),
+                                           cfg.getint('queue', 'block_ms'),
+                                           partial(self.__input_shape, cfg.get('model', 'dtype')),
+                                           partial(self.__drop_stale, runner))
+        # monotonic milliseconds of the host stages of the batches and the
+        # requests, the queue wait is from the api enqueue so it is
+        # measured with the wall clock
+        runner["timings"] = StageTimings()
+        
+        # the input dims of the model, from the configurations when they
+        # are there, the models that are not preloaded are only loaded on
+        # their first batch
+        dims = configured_input_dims(cfg)
+        if preload or dims is None:
+            if not preload:
+                print("[WARNING] no input_shapes for %s, loading it to read them"% name)
+            model = self.registry.acquire(name) # load model
+            try:
+                print("[INFO] type of the model %s "% name, str(type(model)))
+                dims = model.get_model_input_dims(), model.get_input_shapes()
+            finally:
+                self.registry.release(name)
+            if not preload:
+                self.registry.unload(name)
+        (w, h), shapes = dims
+        runner["dims"] = w, h, shapes
+        
+        # serialize model input info from getting pyacl model
+        # with the (h, w) input shapes the images are letterboxed in
+        d_model_input_dims = {'w': w, 'h': h, 'shapes': [list(s) for s in shapes]}
+        # the list is replaced, so restarts of the workers do not grow it
+        key = model_key(cfg, 'model_input_dims')
+        pipe = self.redis_db.pipeline(transaction=True)
+        pipe.delete(key)
+        pipe.rpush(key, dumps(d_model_input_dims))
+        pipe.execute()
+
+        return runner
+
+
+    def __drop_entries(self, runner, messages):
+        # the queue drops the entries delivered too many times, e.g. the
+        # ones crashing the workers, their clients get an error reply
+        # instead of waiting for their deadline
+        replies, slots = [], []
+        for msg in messages:
+            try:
+                q = codec.decode(msg, runner["cfg"].get('model', 'dtype'))
+            except ValueError:
+                continue
+            if q.get("legacy"):
+                continue
+            replies.append((q["id"], codec.encode_result(q["id"], [], status=500,
+                            errorMessage="Model server failed to process the image")))
+            if "slot" in q:
+                slots.append((q["slot"], q.get("generation")))
+        if replies:
+            push_replies(self.redis_db, replies, runner["cfg"].getint('queue', 'reply_ttl'))
+        self.__release_slots(slots)
+
+
+    def __refresh_ring(self):
+        # a worker still holding a ring whose owner has restarted attaches
+        # to the new one, the replaced one is kept until the next restart
+        # as the batches in flight may still hold views of it
+        if self.shm_ring is None or self.shm_ring.owner or \
+                not self.shm_ring.stale(self.redis_db):
+            return
+        ring = attach_ring(self.redis_db, self.shm_ring.name)
+        if ring is not None:
+            print("[INFO] shared memory ring %s was replaced, attached to the new one"%
+                  ring.name)
+            self.replaced_ring, self.shm_ring = self.shm_ring, ring
+
+
+    def __release_slots(self, slots):
+        # give the (slot, generation) slots back, the ones of a replaced
+        # ring are not in the free list of the current one
+        if not slots:
+            return
+        self.__refresh_ring()
+        slots = [slot for slot, generation in slots if generation == self.shm_ring.generation]
+        if slots:
+            self.shm_ring.release(self.redis_db, slots)
+
+
+    def __drop_stale(self, runner, entries):
+        # keep the entries whose clients still wait, the expired and
+        # cancelled ones are acked and their slots given back, the
+        # messages that can not be decoded are dropped in fetch
+        queue = []
+        for entry in entries:
+            try:
+                queue.append((entry, codec.decode(entry[1], runner["cfg"].get('model', 'dtype'))))
+            except ValueError:
+                queue.append((entry, None))
+        cancelled_ids = cancelled(self.redis_db, [q["id"] for _, q in queue if q])
+
+        now = time()
+        kept, stale = [], []
+        for entry, q in queue:
+            if q and (q["id"] in cancelled_ids or q.get("deadline", now) < now):
+                stale.append((entry[0], q))
+            else:
+                kept.append(entry)
+        if stale:
+            print("[INFO] dropped %d expired or cancelled images"% len(stale))
+            acked = set(runner["queue"].ack([entry_id for entry_id, _ in stale]))
+            self.__release_slots([(q["slot"], q.get("generation")) for entry_id, q in stale
+                                  if "slot" in q and entry_id in acked])
+
+        return kept
+
+
+    def __input_shape(self, dtype, entry):
+        # batcher key, the (h, w) input shape the api chose for the image,
+        # the messages that can not be decoded are dropped in fetch
+        try:
+            return tuple(codec.decode(entry[1], dtype).get('input_shape') or ())
+        except ValueError:
+            return ()
+
+
+    def __update_service_rate(self, runner, n, seconds):
+        # exponentially weighted images/sec of the slowest stage, the api
+        # estimates the wait of new requests from it
+        if n > 0 and seconds > 0:
+            rate = n / seconds
+            runner["service_rate"] = rate if runner["service_rate"] is None else \
+                                     0.8 * runner["service_rate"] + 0.2 * rate
+
+
+    def __publish_stats(self, runner):
+        # publish the rate regularly with the metrics, it works as a heartbeat
+        now = time()
+        cfg = runner["cfg"]
+        if now - runner["stats_published"] >= cfg.getfloat('admission', 'stats_interval'):
+            publish_worker_stats(self.redis_db, worker_name(), runner["service_rate"],
+                                 model_key(cfg, STATS_KEY))
+            metrics = runner["batcher"].snapshot()
+            # the host stages with the device and postprocess ones of the model
+            metrics['timings'] = runner["timings"].snapshot()
+            model = self.registry.peek(runner["name"])
+            if model is not None:
+                metrics['timings'].update(model.snapshot())
+            metrics['registry'] = self.registry.snapshot()
+            if runner["pipeline"] is not None:
+                metrics['stages'] = runner["pipeline"].snapshot()
+            publish_worker_metrics(self.redis_db, model_key(cfg, worker_name()), metrics)
+            runner["stats_published"] = now
+
+
+    def __fetch_stage(self, runner, _):
+        # block until the batcher dispatches a batch of images, then
+        # initialize the image IDs and batch of images themselves
+        self.__publish_stats(runner)
+        entries = runner["batcher"].next_batch()
+        if not entries:
+            return None
+        
+        start = perf_counter()
+        # deserialize the objects, the images are not copied, the
+        # messages that can not be decoded are acked with the batch and
+        # dropped
+        queue = []
+        for entry_id, msg in entries:
+            try:
+                queue.append((entry_id, codec.decode(msg, runner["cfg"].get('model', 'dtype'))))
+            except ValueError as e:
+                print("[ERROR] dropping queue entry %s: %s"% (entry_id, e))
+        # find the requests whose clients have given up
+        cancelled_ids = cancelled(self.redis_db, [q["id"] for _, q in queue])
+        if any("slot" in q for _, q in queue):
+            self.__refresh_ring()
+        
+        batch = {"runner": runner, "entries": entries, "images": [], "ids": [], "dims": [],
+                 "ratio_pads": [], "encoded": [], "slots": [], "replies": [], "times": {},
+                 "legacy": set(), "legacy_replies": []}
+        dropped = 0
+        now = time()
+        # loop over the queue
+        for entry_id, q in queue:
+            if "ts" in q:
+                runner["timings"].observe('queue_wait', (now - q["ts"]) * 1000, len(queue))
+            if "slot" in q:
+                if self.shm_ring is None or q.get("generation") != self.shm_ring.generation:
+                    # written into the ring of a restarted worker
+                    print("[ERROR] image %s is in a replaced shared memory ring"% q["id"])
+                    batch["replies"].append((q["id"], codec.encode_result(q["id"], [], 
+                                             status=503, errorMessage="Model server restarted")))
+                    continue
+                # the slot goes back once its entry is acked
+                batch["slots"].append((entry_id, q["slot"], q["generation"]))
+
+            # drop the images given up while they waited in the batcher
+            if q["id"] in cancelled_ids or q.get("deadline", now) < now:
+                dropped += 1
+                continue
+
+            if q["img"] is None:
+                # the image is in a shared memory slot, the model copies
+                # it to the device straight from the slot
+                q["img"] = self.shm_ring.view(q["slot"], q["img_dtype"], 
+                                              q["img_np_dims"])
+            if q.get("encoded"):
+                # the uploaded file, decoded and preprocessed with the
+                # others of the batch in the prepare stage
+                shape = q.get("input_shape")
+                batch["encoded"].append((len(batch["images"]),
+                                         (shape[1], shape[0]) if shape else runner["dims"][:2]))
+            
+            # update list of image dims and of their letterbox in the
+            # model input, the old api versions do not send it
+            batch["dims"].append(q["img_dims"])
+            batch["ratio_pads"].append(q.get("ratio_pad"))
+            # update list of image
+            batch["images"].append(q["img"])
+            # update the list of image IDs
+            batch["ids"].append(q["id"])
+            if q.get("legacy"):
+                batch["legacy"].add(q["id"])
+
+        if dropped:
+            print("[INFO] dropped %d expired or cancelled images"% dropped)
+
+        batch["times"]["fetch"] = perf_counter() - start
+        return batch
+
+
+    def __prepare_stage(self, batch):
+        # decode and preprocess the uploaded files of the batch in the
+        # pool, the ones of an input size into the rows of one tensor
+        start = perf_counter()
+        images, ids, dims, ratio_pads = batch["images"], batch["ids"], batch["dims"], \
+                                        batch["ratio_pads"]
+        invalid = []
+        for size in set(size for _, size in batch["encoded"]):
+            indexes = [i for i, s in batch["encoded"] if s == size]
+            w, h = size
+            out = np.empty((len(indexes), 12, h // 2, w // 2), dtype=np.float32)
+            results = preprocess_batch([images[i] for i in indexes], size, out,
+                                       self.preprocess_pool,
+                                       self.cfg.getint('file', 'max_pixels'))
+            for j, (i, res) in enumerate(zip(indexes, results)):
+                if res is None:
+                    invalid.append(i)
+                else:
+                    images[i] = out[j:j + 1]
+                    dims[i], ratio_pads[i] = res
+        if batch["encoded"]:
+            batch["runner"]["timings"].observe('decode', elapsed_ms(start), len(batch["encoded"]))
+
+        for i in sorted(invalid, reverse=True):
+            # tell the api about the images that can not be processed
+            print("[ERROR] image %s can not be decoded"% ids[i])
+            batch["replies"].append((ids[i], codec.encode_result(ids[i], [], 
+                                     errorMessage="Uploaded file is not a valid image")))
+            del images[i], dims[i], ratio_pads[i], ids[i]
+
+        batch["times"]["prepare"] = perf_counter() - start
+        return batch
+
+
+    def __infer_stage(self, batch):
+        # launch the batch on the NPU without waiting for it, the next
+        # batch can be launched while this one runs
+        start = perf_counter()
+        batch["times"]["infer"] = 0
+        batch["inference"] = None
+        batch["model"] = None
+        batch["infer_done"] = Event()
+        if batch["images"]:
+            # the model stays on the device until the batch is postprocessed
+            name = batch["runner"]["name"]
+            batch["model"] = self.registry.acquire(name)
+            # the next batches are kept to what the model launches at
+            # once, a bigger one runs in slower waves
+            limit = batch["model"].get_max_submit_size()
+            if limit:
+                batch["runner"]["batcher"].limit(limit)
+            try:
+                batch["inference"] = batch["model"].submit(batch["images"])
+            except Exception:
+                self.registry.release(name)
+                raise
+            batch["inference"].add_done_callback(
+                lambda _, n=len(batch["images"]): self.__infer_done(batch, n, start))
+
+        return batch
+
+
+    def __infer_done(self, batch, n, start):
+        # the batcher adapts the batch size to the model latency
+        try:
+            batch["times"]["infer"] = perf_counter() - start
+            batch["runner"]["batcher"].observe(n, batch["times"]["infer"])
+            batch["runner"]["timings"].observe('infer', batch["times"]["infer"] * 1000, n)
+        finally:
+            batch["infer_done"].set()
+
+
+    def __post_stage(self, batch):
+        start = perf_counter()
+        runner = batch["runner"]
+        # loop over the image IDs and their corresponding set of
+        # results from our model, the detections are sent as
+        # a float32 array
+        if batch["inference"] is not None:
+            # the feature maps are views of the device slots host
+            # buffers, the slots go back once they are postprocessed
+            model = batch["model"]
+            try:
+                feature_maps, device_slots = batch["inference"].result()
+                # result() may return before the done callback has run,
+                # the service rate needs its infer time
+                batch["infer_done"].wait()
+                start = perf_counter()
+                try:
+                    results = model.postprocess(feature_maps, batch["dims"], batch["ratio_pads"])
+                finally:
+                    model.release(device_slots)
+            finally:
+                self.registry.release(runner["name"])
+            for (imageID, result) in zip(batch["ids"], results):
+                if imageID in batch["legacy"]:
+                    # the old api reads the json of the boxes with GET <id>
+                    batch["legacy_replies"].append((imageID, dumps({"bboxes": str(result)})))
+                else:
+                    batch["replies"].append((imageID, codec.encode_result(imageID, result)))
+
+        publish = perf_counter()
+        self.__finish(batch)
+        runner["timings"].observe('publish', elapsed_ms(publish), len(batch["ids"]))
+
+        batch["times"]["post"] = perf_counter() - start
+        self.__update_service_rate(runner, len(batch["ids"]), max(batch["times"].values()))
+        return None
+
+
+    def __finish(self, batch):
+        # push the output predictions of the whole batch to the reply
+        # lists in one round trip, the waiting api requests are woken
+        # up at once, only once per batch
+        if batch.get("finished"):
+            return
+        batch["finished"] = True
+        runner = batch["runner"]
+        try:
+            # the old api versions do not read the reply lists, and have
+            # no error replies
+            replies = [(k, output) for k, output in batch["replies"] if k not in batch["legacy"]]
+            if replies:
+                push_replies(self.redis_db, replies, runner["cfg"].getint('queue', 'reply_ttl'))
+            if batch["legacy_replies"]:
+                set_replies(self.redis_db, batch["legacy_replies"],
+                            runner["cfg"].getint('queue', 'reply_ttl'))
+        finally:
+            # remove the set of images from our queue and give their
+            # shared memory slots back, even if the replies could not be
+            # pushed, the ones of entries another worker has reclaimed
+            # and acked are its own
+            acked = set(runner["queue"].ack([entry_id for entry_id, _ in batch["entries"]]))
+            self.__release_slots([(slot, generation) for entry_id, slot, generation
+                                  in batch["slots"] if entry_id in acked])
+
+
+    def __fail(self, batch):
+        # the images of a failed batch that have no reply yet get an
+        # error reply, then the batch is finished as usual
+        replied = set(k for k, _ in batch["replies"])
+        for k in batch["ids"]:
+            if k not in replied:
+                batch["replies"].append((k, codec.encode_result(k, [], status=500,
+                                         errorMessage="Model server failed to process the image")))
+        self.__finish(batch)
+
+
+    def __guarded(self, stage, batch):
+        # run a stage of a fetched batch, a batch failing in it is not
+        # lost, its clients are told and its entries acked
+        try:
+            return stage(batch)
+        except Exception:
+            print("[ERROR] batch of %d images failed:\n%s"% (len(batch["ids"]), format_exc()))
+            try:
+                self.__fail(batch)
+            except Exception:
+                print("[ERROR] failed batch could not be finished:\n%s"% format_exc())
+            return None
+
+
+    def model_process(self):
+        # one pipeline per model, its fetch stage reads the queue of the model
+        runner_stages = [[('fetch', partial(self.__fetch_stage, runner)),
+                          ('prepare', partial(self.__guarded, self.__prepare_stage)),
+                          ('infer', partial(self.__guarded, self.__infer_stage)),
+                          ('post', partial(self.__guarded, self.__post_stage))]
+                         for runner in self.runners]
+
+        # run the stages in their own threads, so the NPU does not wait
+        # for the host work of the batches before and after
+        if self.cfg.getboolean('pipeline', 'enabled'):
+            for runner, stages in zip(self.runners, runner_stages):
+                runner["pipeline"] = Pipeline(stages, self.cfg.getint('pipeline', 'depth'))
+                runner["pipeline"].start()
+            for runner in self.runners:
+                runner["pipeline"].join()
+            return
+
+        # continually pool for new images to process, one stage after
+        # another, the models in turn
+        while True:
+            for stages in runner_stages:
+                batch = None
+                for _, stage in stages:
+                    batch = stage(batch)
+                    if batch is None:
+                        break
+
+
+# pyacl_app main
+if __name__ == "__main__":
+    runNet = RunNet()
     runNet.model_process()
\ No newline at end of file
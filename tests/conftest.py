@@ -0,0 +1,7 @@
+# -*- coding:utf-8 -*-
+import sys
+
+from os import path
+
+# the modules are imported from the root of the repository, as the apps do
+sys.path.insert(0, path.dirname(path.dirname(path.abspath(__file__))))
@@ -0,0 +1,110 @@
+# -*- coding:utf-8 -*-
+import time
+import pytest
+
+fakeredis = pytest.importorskip("fakeredis")
+
+from utils.redis_queue import ListQueue, StreamQueue, LegacyQueue
+
+
+@pytest.fixture
+def redis_db():
+    return fakeredis.FakeRedis()
+
+
+def make_stream(redis_db, consumer, **kwargs):
+    q = StreamQueue(redis_db, "q", "workers", **kwargs)
+    q.consumer = consumer
+    return q
+
+
+def test_list_queue_put_get(redis_db):
+    q = ListQueue(redis_db, "q")
+    for i in range(3):
+        q.put(b"m%d" % i)
+
+    assert q.get(2, 0) == [(None, b"m0"), (None, b"m1")]
+    assert q.depth() == 1
+    assert q.get(5, 10) == [(None, b"m2")]
+    assert q.get(5, 10) == []
+
+
+def test_stream_ack_deletes_entries(redis_db):
+    q = make_stream(redis_db, "a")
+    q.put(b"m0")
+    q.put(b"m1")
+
+    entries = q.get(5, 0)
+    assert [msg for _, msg in entries] == [b"m0", b"m1"]
+    q.ack([entry_id for entry_id, _ in entries])
+    assert redis_db.xlen("q") == 0
+    assert redis_db.xpending("q", "workers")["pending"] == 0
+
+
+def test_stream_reclaims_idle_entries(redis_db):
+    a = make_stream(redis_db, "a", reclaim_idle_ms=20)
+    b = make_stream(redis_db, "b", reclaim_idle_ms=20)
+    a.put(b"m0")
+
+    # "a" reads the entry and dies before acking it
+    assert [msg for _, msg in a.get(1, 0)] == [b"m0"]
+    assert b.get(1, 0) == []
+
+    time.sleep(0.05)
+    entries = b.get(1, 0)
+    assert [msg for _, msg in entries] == [b"m0"]
+    b.ack([entry_id for entry_id, _ in entries])
+    assert redis_db.xlen("q") == 0
+
+
+def test_stream_drops_after_max_deliveries(redis_db):
+    dropped = []
+    q = make_stream(redis_db, "a", reclaim_idle_ms=20, max_deliveries=2,
+                    on_drop=dropped.extend)
+    q.put(b"poison")
+    q.put(b"good")
+
+    # the first delivery and one reclaim, then the entry is dropped
+    assert len(q.get(1, 0)) == 1
+    time.sleep(0.05)
+    assert [msg for _, msg in q.get(1, 0)] == [b"poison"]
+    time.sleep(0.05)
+    entries = q.get(1, 0)
+
+    assert dropped == [b"poison"]
+    assert [msg for _, msg in entries] == [b"good"]
+    q.ack([entry_id for entry_id, _ in entries])
+    assert redis_db.xlen("q") == 0
+    assert redis_db.xpending("q", "workers")["pending"] == 0
+
+
+def test_stream_ack_returns_first_acker_only(redis_db):
+    a = make_stream(redis_db, "a", reclaim_idle_ms=20)
+    b = make_stream(redis_db, "b", reclaim_idle_ms=20)
+    a.put(b"m0")
+
+    # "a" is slow, "b" reclaims the entry and both process it
+    entries = a.get(1, 0)
+    time.sleep(0.05)
+    assert b.get(1, 0) == entries
+
+    ids = [entry_id for entry_id, _ in entries]
+    assert b.ack(ids) == ids
+    assert a.ack(ids) == []
+    assert a.ack([]) == []
+
+
+def test_list_queue_ack_returns_ids(redis_db):
+    assert ListQueue(redis_db, "q").ack([None, None]) == [None, None]
+
+
+def test_legacy_queue_reads_the_old_list_first(redis_db):
+    q = LegacyQueue(make_stream(redis_db, "a"), ListQueue(redis_db, "old"))
+    q.put(b"new")
+    redis_db.rpush("old", b"legacy")
+
+    entries = q.get(5, 0)
+    assert [msg for _, msg in entries] == [b"legacy", b"new"]
+    assert entries[0][0] is None
+    assert q.ack([entry_id for entry_id, _ in entries]) == [entries[1][0], None]
+    assert q.depth() == 0
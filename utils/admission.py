@@ -0,0 +1,105 @@
+"""
+This script provide the admission control of the rest api, requests
+are rejected early when the model servers can not answer them in time
+
+Copyright 2022 Huawei Technologies Co., Ltd
+
+The workers publish their measured service rate (images/sec) to the
+"worker_stats" redis hash, the expected wait of a new request is the
+queue depth divided by the sum of the rates of the live workers. Every
+model of the registry has its own queue and stats hash.
+
+CREATED:  2026-10-18 13:52:09
+MODIFIED: 2026-10-18 22:14:37
+"""
+# -*- coding:utf-8 -*-
+from math import ceil
+from time import time
+from json import dumps, loads
+from threading import Lock
+from utils.metrics import Counters
+
+
+STATS_KEY = "worker_stats"
+
+
+def publish_worker_stats(redis_db, name, rate, key=STATS_KEY):
+    # called by the workers, "rate" is None until a batch is measured
+    redis_db.hset(key, name, dumps({'rate': rate, 'ts': time()}))
+
+
+class AdmissionController(object):
+    def __init__(self, redis_db, queue, wait_budget, max_depth,
+                 stale_after=5.0, refresh=0.1, stats_key=STATS_KEY):
+        self.redis_db = redis_db
+        self.queue = queue
+        self.stats_key = stats_key
+        self.wait_budget = wait_budget  # seconds
+        self.max_depth = max_depth
+        self.stale_after = stale_after  # seconds without stats = dead worker
+        self.refresh = refresh          # seconds the redis state is cached
+
+        self.lock = Lock()
+        self.metrics = Counters()
+        self.depth = 0
+        self.rate = None
+        self.workers = 0
+        self.updated = 0.0
+
+
+    def __update(self):
+        # read the queue depth and the stats of the workers
+        stats = self.redis_db.hgetall(self.stats_key)
+        depth = self.queue.depth()
+
+        now = time()
+        rates = []
+        dead = []
+        for name, s in stats.items():
+            s = loads(s.decode("utf-8"))
+            if now - s['ts'] <= self.stale_after:
+                rates.append(s['rate'])
+            else:
+                dead.append(name)
+
+        # forget the workers that have stopped
+        if dead:
+            self.redis_db.hdel(self.stats_key, *dead)
+
+        self.depth = depth
+        self.workers = len(rates)
+        # the rate is unknown while a live worker has not measured it yet
+        self.rate = None if None in rates else sum(rates)
+        self.updated = now
+
+
+    def admit(self):
+        # returns (admitted, status, retry_after seconds, reason)
+        with self.lock:
+            if time() - self.updated > self.refresh:
+                self.__update()
+
+            if self.workers == 0:
+                reason, status, retry_after = 'no_worker', 503, self.stale_after
+            elif self.depth >= self.max_depth:
+                reason, status = 'queue_full', 429
+                retry_after = self.depth / self.rate if self.rate else self.stale_after
+            elif self.rate and (self.depth + 1) / self.rate > self.wait_budget:
+                reason, status = 'wait_budget', 429
+                retry_after = (self.depth + 1) / self.rate - self.wait_budget
+            else:
+                # count the admitted request until the next update
+                self.depth += 1
+                self.metrics.inc('admitted')
+                return True, 200, 0, None
+
+        self.metrics.inc('shed_%s' % reason)
+        return False, status, max(1, int(ceil(retry_after))), reason
+
+
+    def snapshot(self):
+        with self.lock:
+            state = {'queue_depth': self.depth, 'service_rate': self.rate,
+                     'workers': self.workers}
+        state.update(self.metrics.snapshot())
+        return state
@@ -0,0 +1,141 @@
+"""
+This script provide the dynamic batching scheduler of pyacl_app,
+it collects the queued images into batches for the model
+
+Copyright 2022 Huawei Technologies Co., Ltd
+
+A batch is dispatched as soon as it is full or the oldest image in
+it has waited max_queue_delay_ms in the worker. With preferred batch
+sizes, a partial batch is cut to the largest preferred size when the
+rest can still wait for the next one. With a latency budget, the batch
+size is lowered while the model runs over the budget and raised again
+while full batches run well under it. With a key function, only the
+entries of the key of the oldest one, e.g. the same input shape, are
+batched together. With a drop function, the entries it does not keep,
+e.g. expired or cancelled ones, are left out as they are claimed and
+never take the place of a live one in a batch.
+
+CREATED:  2026-10-18 15:21:44
+MODIFIED: 2026-10-19 13:06:40
+"""
+# -*- coding:utf-8 -*-
+from time import time
+from utils.metrics import Histogram
+
+
+class DynamicBatcher(object):
+    def __init__(self, queue, max_batch_size, max_queue_delay_ms,
+                 preferred_batch_sizes=(), latency_budget_ms=0, idle_block_ms=50,
+                 key=None, drop=None):
+        self.queue = queue
+        self.key = key
+        self.drop = drop
+        self.max_batch_size = max_batch_size
+        self.max_queue_delay = max_queue_delay_ms / 1000.0
+        self.preferred_batch_sizes = sorted(s for s in preferred_batch_sizes
+                                            if s <= max_batch_size)
+        self.latency_budget = latency_budget_ms / 1000.0
+        self.idle_block_ms = idle_block_ms
+
+        # current batch size limit, only changed with a latency budget
+        self.batch_size = max_batch_size
+        # claimed entries that did not fit in the last batch
+        self.pending = []
+        self.arrivals = []
+        self.keys = []
+        self.dropped = 0
+
+        self.batch_size_hist = Histogram(range(1, max_batch_size + 1))
+        self.batch_wait_hist = Histogram([1, 2, 5, 10, 20, 50, 100, 200, 500, 1000])
+
+
+    def __cut(self, arrivals, now):
+        # size of the batch to dispatch from the pending entries arrived
+        # at "arrivals", the entries left over must not have used up
+        # their delay already
+        n = len(arrivals)
+        if n >= self.batch_size:
+            return self.batch_size
+
+        for s in reversed(self.preferred_batch_sizes):
+            if s <= n and (s == n or arrivals[s] + self.max_queue_delay > now):
+                return s
+        return n
+
+
+    def __claim(self, entries):
+        if self.drop and entries:
+            kept = self.drop(entries)
+            self.dropped += len(entries) - len(kept)
+            entries = kept
+        self.pending += entries
+        self.arrivals += [time()] * len(entries)
+        self.keys += [self.key(entry) if self.key else None for entry in entries]
+
+
+    def next_batch(self):
+        # returns the entries of the next batch, an empty list when the
+        # queue stays empty for idle_block_ms
+        while len(self.pending) < self.batch_size:
+            if self.pending:
+                left = self.arrivals[0] + self.max_queue_delay - time()
+                if left <= 0:
+                    # take what is already queued without waiting
+                    self.__claim(self.queue.get(self.batch_size - len(self.pending), 0))
+                    break
+                block_ms = max(1, int(left * 1000))
+            else:
+                block_ms = self.idle_block_ms
+
+            self.__claim(self.queue.get(self.batch_size - len(self.pending), block_ms))
+            if not self.pending:
+                return []
+
+        now = time()
+        # the pending entries of the key of the oldest one
+        group = [i for i, key in enumerate(self.keys) if key == self.keys[0]]
+        group = group[:self.__cut([self.arrivals[i] for i in group], now)]
+        batch = [self.pending[i] for i in group]
+        arrivals = [self.arrivals[i] for i in group]
+        n = len(group)
+        taken = set(group)
+        self.pending = [e for i, e in enumerate(self.pending) if i not in taken]
+        self.arrivals = [a for i, a in enumerate(self.arrivals) if i not in taken]
+        self.keys = [k for i, k in enumerate(self.keys) if i not in taken]
+
+        self.batch_size_hist.observe(n)
+        for arrival in arrivals:
+            self.batch_wait_hist.observe((now - arrival) * 1000)
+
+        return batch
+
+
+    def limit(self, max_batch_size):
+        # lower the max batch size to what the model takes at once, the
+        # model is only known once it is loaded
+        if max_batch_size >= self.max_batch_size:
+            return
+        print("[INFO] max batch size lowered to %d"% max_batch_size)
+        self.max_batch_size = max_batch_size
+        self.batch_size = min(self.batch_size, max_batch_size)
+        self.preferred_batch_sizes = [s for s in self.preferred_batch_sizes
+                                      if s <= max_batch_size]
+
+
+    def observe(self, n, seconds):
+        # feed back the model latency of a batch of "n" images
+        if not self.latency_budget:
+            return
+
+        if seconds > self.latency_budget and self.batch_size > 1:
+            self.batch_size = max(1, self.batch_size * 3 // 4)
+            print("[INFO] batch size lowered to %d (%.1f ms)"% (self.batch_size, seconds * 1000))
+        elif seconds < 0.8 * self.latency_budget and n >= self.batch_size and \
+             self.batch_size < self.max_batch_size:
+            self.batch_size += 1
+
+
+    def snapshot(self):
+        return {'batch_size_limit': self.batch_size, 'dropped': self.dropped,
+                'batch_size': self.batch_size_hist.snapshot(),
+                'batch_wait_ms': self.batch_wait_hist.snapshot()}
@@ -0,0 +1,92 @@
+"""
+This script is used to time the model of the configured backend, on
+the NPU with several streams, run it once per stream count, for example:
+
+    python3 utils/benchmark.py 1
+    python3 utils/benchmark.py 2
+
+Copyright 2022 Huawei Technologies Co., Ltd
+
+Every batch records the host timestamps of its submit, launch and
+completion, the device time of its copies and compute comes from the
+events of NET. The images are zeros of the model input size.
+
+CREATED:  2026-10-18 19:48:51
+MODIFIED: 2026-10-18 22:40:05
+"""
+# -*- coding:utf-8 -*-
+# import the necessary packages
+import sys
+import numpy as np
+
+from os import path
+from time import time
+from collections import deque
+from configparser import ConfigParser
+
+sys.path.append(path.abspath('.'))
+from model.backend import make_backend
+
+# define configurations
+print("[INFO] loading configurations . . .")
+cfg = ConfigParser()
+cfg.read(path.abspath('./data/app.cfg'))
+
+streams = int(sys.argv[1]) if len(sys.argv) > 1 else cfg.getint('npu', 'streams')
+batches = cfg.getint('benchmark', 'batches')
+
+cfg.set('npu', 'streams', str(streams))
+cfg.set('npu', 'pool_size', str(streams + 1))
+model = make_backend(cfg)
+w, h = model.get_model_input_dims()
+# one launch per batch
+batch_size = min(cfg.getint('model', 'batch_size'), model.get_max_batch_size())
+images = [np.zeros((1, 12, h // 2, w // 2), dtype=cfg.get('model', 'dtype'))
+          for _ in range(batch_size)]
+
+
+def done(stamps):
+    # runs in the report thread once the outputs are on the host
+    stamps['done'] = time()
+
+
+# warm up the streams and the device pools
+for _ in range(streams):
+    feature_maps, slots = model.execute(images)
+    model.release(slots)
+
+# keep one batch per stream in flight
+timeline = []
+in_flight = deque()
+start = time()
+for i in range(batches):
+    if len(in_flight) >= streams:
+        stamps, future = in_flight.popleft()
+        model.release(future.result()[1])
+        stamps['released'] = time()
+
+    stamps = {'submit': time()}
+    future = model.submit(images)
+    stamps['launched'] = time()
+    future.add_done_callback(lambda _, stamps=stamps: done(stamps))
+    in_flight.append((stamps, future))
+    timeline.append(stamps)
+
+while in_flight:
+    stamps, future = in_flight.popleft()
+    model.release(future.result()[1])
+    stamps['released'] = time()
+elapsed = time() - start
+
+
+def mean_ms(first, last):
+    return 1000 * np.mean([s[last] - s[first] for s in timeline])
+
+
+print("[INFO] %d streams, %d batches of %d images in %.3f sec, %.1f images/sec"
+      % (streams, batches, batch_size, elapsed, batches * batch_size / elapsed))
+print("[INFO] host staging and launch %.2f ms, launch to outputs %.2f ms"
+      % (mean_ms('submit', 'launched'), mean_ms('launched', 'done')))
+for name, t in sorted(model.snapshot().items()):
+    print("[INFO] device %s ms mean %.2f p50 %.2f p95 %.2f p99 %.2f (last %d)"
+          % (name, t['mean'], t['p50'], t['p95'], t['p99'], t['count']))
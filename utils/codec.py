@@ -0,0 +1,121 @@
+"""
+This script provide the wire format shared by flask_app and pyacl_app
+for the messages travelling through the redis queue
+
+Copyright 2022 Huawei Technologies Co., Ltd
+
+Message layout (version 1, little endian):
+  magic(4s) version(B) dtype(B) ndim(B) id(16s) meta_len(I)
+  shape(ndim * I) meta(meta_len bytes of json) payload(raw array bytes)
+
+The payload is left out when the array is passed another way, e.g.
+in a shared memory slot named in the meta data.
+
+The replies of the worker use the same layout, the payload is the
+float32 (n, 6) detections array: x1, y1, x2, y2, conf, class id.
+
+The base64 in json messages of the api versions before the codec are
+still decoded during the rollout, they are marked "legacy" so their
+replies are given the old way.
+
+CREATED:  2026-10-18 09:12:13
+MODIFIED: 2026-10-19 11:42:08
+"""
+# -*- coding:utf-8 -*-
+import numpy as np
+
+from uuid import UUID
+from struct import Struct
+from base64 import b64decode
+from json import dumps, loads
+
+
+MAGIC = b'ACLT'
+VERSION = 1
+
+# fixed size part of the message
+_HEADER = Struct('<4sBBB16sI')
+
+# array dtypes that can travel on the wire, the index is the dtype code
+_DTYPES = ('float32', 'float16', 'float64', 'uint8', 'int8', 'int16', 'int32')
+
+
+def encode_header(k, dtype, shape, **meta):
+    # serialize the request id "k", the array dtype/shape and the extra
+    # json serializable meta data (image dims etc.), without payload
+    meta = dumps(meta).encode("utf-8")
+    shape = Struct('<%dI' % len(shape)).pack(*shape)
+
+    # pad the meta data with spaces so the payload starts 8 bytes aligned
+    meta += b' ' * (-(_HEADER.size + len(shape) + len(meta)) % 8)
+    header = _HEADER.pack(MAGIC, VERSION, _DTYPES.index(np.dtype(dtype).name),
+                          len(shape) // 4, UUID(k).bytes, len(meta))
+
+    return header + shape + meta
+
+
+def encode(k, a, **meta):
+    # serialize the array "a" with its header into one message
+    a = np.ascontiguousarray(a)
+    header = encode_header(k, a.dtype, a.shape, **meta)
+
+    return b''.join((header, memoryview(a.reshape(-1).view(np.uint8))))
+
+
+def _decode_legacy(msg, dtype):
+    # base64 in json message, sent by api versions before the codec
+    try:
+        q = loads(msg.decode("utf-8"))
+        a = np.frombuffer(b64decode(q["img"]), dtype=dtype)
+        q["img"] = a.reshape(tuple(q["img_np_dims"]))
+    except (UnicodeDecodeError, ValueError, KeyError, TypeError) as e:
+        raise ValueError("neither a codec nor a legacy json message: %s" % e)
+
+    q["legacy"] = True
+    return q
+
+
+def decode(msg, dtype='float32'):
+    # deserialize a queue message, the returned image is a read-only view
+    # over "msg" so no copy of the payload is made, or None when the
+    # message has no payload. "dtype" is only used by the old json
+    # messages which do not carry it
+    if msg[:len(MAGIC)] != MAGIC:
+        return _decode_legacy(msg, dtype)
+
+    _, version, dtype_code, ndim, k, meta_len = _HEADER.unpack_from(msg, 0)
+    if version != VERSION:
+        raise ValueError("unsupported message version %d" % version)
+
+    offset = _HEADER.size
+    shape = Struct('<%dI' % ndim).unpack_from(msg, offset)
+    offset += 4 * ndim
+    q = loads(msg[offset:offset + meta_len].decode("utf-8"))
+    offset += meta_len
+
+    q["id"] = str(UUID(bytes=k))
+    q["img_dtype"] = _DTYPES[dtype_code]
+    q["img_np_dims"] = list(shape)
+    q["img"] = None
+    if offset < len(msg):
+        count = int(np.prod(shape)) if ndim else 1
+        q["img"] = np.frombuffer(msg, dtype=q["img_dtype"], count=count,
+                                 offset=offset).reshape(shape)
+
+    return q
+
+
+def encode_result(k, dets, **meta):
+    # serialize the detections of an image, [[x1, y1, x2, y2, conf, cls]]
+    dets = np.asarray(dets, dtype=np.float32).reshape(-1, 6)
+    return encode(k, dets, **meta)
+
+
+def decode_result(msg):
+    # deserialize a reply, returns the (n, 6) detections and the meta data
+    q = decode(msg)
+    dets = q.pop("img")
+    if dets is None:
+        dets = np.zeros((0, 6), dtype=np.float32)
+
+    return dets, q
@@ -0,0 +1,73 @@
+"""
+This script provide the letterbox of the images in the model inputs,
+the one geometry of the preprocessing and of scale_coords
+Copyright 2022 Huawei Technologies Co., Ltd
+
+A plan is the resize, the padding and the ratio_pad of an image size in
+an input shape. The plans are memoised per (image size, input shape), the
+images of a camera always have the same size. The ratio_pad of the plan
+travels with the request and scale_coords maps the boxes back with it.
+
+CREATED:  2026-10-18 23:24:06
+MODIFIED: 2026-10-18 23:24:06
+"""
+# -*- coding:utf-8 -*-
+import cv2
+
+from functools import lru_cache
+
+
+STRIDE = 32     # the input height and width of the model are multiples of it
+PAD_VALUE = 128 # grey of the padding
+PLAN_CACHE_SIZE = 1024  # (image size, input shape) plans kept
+
+def choose_input_shape(img_shape, shapes):
+    # the smallest (h, w) of "shapes" holding the image at the scale of
+    # the largest side of the shapes, padded to stride multiples, the
+    # largest shape when none holds it
+    shapes = sorted((tuple(s) for s in shapes), key=lambda s: (s[0] * s[1], s))
+    side = max(max(s) for s in shapes)
+    h, w = img_shape[:2]
+    r = min(side / h, side / w)
+    need = (-(-int(round(h * r)) // STRIDE) * STRIDE, -(-int(round(w * r)) // STRIDE) * STRIDE)
+
+    for s in shapes:
+        if s[0] >= need[0] and s[1] >= need[1]:
+            return s
+    return shapes[-1]
+
+@lru_cache(maxsize=PLAN_CACHE_SIZE)
+def _plan(h, w, new_h, new_w):
+    r = min(new_h / h, new_w / w)
+    new_unpad = int(round(w * r)), int(round(h * r))
+
+    dw, dh = new_w - new_unpad[0], new_h - new_unpad[1]
+    left, top = dw // 2, dh // 2
+    return new_unpad, (left, top, dw - left, dh - top), ((r, r), (left, top))
+
+def letterbox_plan(img_shape, new_shape):
+    # resize (w, h), padding (left, top, right, bottom) and ratio_pad of
+    # scale_coords to fit an image of img_shape in the centre of new_shape
+    return _plan(int(img_shape[0]), int(img_shape[1]), int(new_shape[0]), int(new_shape[1]))
+
+def plan_cache_info():
+    # hits, misses and size of the plan cache
+    return _plan.cache_info()
+
+def resize(img, new_unpad):
+    # resize the pixels of the image to new_unpad (w, h)
+    if img.shape[1::-1] == new_unpad:
+        return img
+
+    interpolation = cv2.INTER_AREA if new_unpad[0] < img.shape[1] else \
+                    cv2.INTER_CUBIC
+    return cv2.resize(img, new_unpad, interpolation=interpolation)
+
+def letterbox(img, new_shape):
+    # resize keeping the aspect ratio then pad to new_shape (h, w),
+    # returns the image and its ratio_pad
+    new_unpad, (left, top, right, bottom), ratio_pad = letterbox_plan(img.shape, new_shape)
+
+    img = cv2.copyMakeBorder(resize(img, new_unpad), top, bottom, left, right,
+                             cv2.BORDER_CONSTANT, value=(PAD_VALUE, PAD_VALUE, PAD_VALUE))
+    return img, ratio_pad
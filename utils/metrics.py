@@ -0,0 +1,131 @@
+"""
+This script provide thread safe metrics shared by the
+flask_app and pyacl_app processes
+
+Copyright 2022 Huawei Technologies Co., Ltd
+
+The workers publish a snapshot of their metrics to the "worker_metrics"
+redis hash, the rest api shows them on /metrics. The stage timings
+keep the last samples of every stage and batch size, the rest api
+shows their p50/p95/p99 on /metrics/timings.
+
+CREATED:  2026-10-18 13:52:09
+MODIFIED: 2026-10-18 22:40:05
+"""
+# -*- coding:utf-8 -*-
+from math import ceil
+from time import perf_counter
+from bisect import bisect_left
+from collections import deque
+from json import dumps, loads
+from threading import Lock
+
+
+METRICS_KEY = "worker_metrics"
+
+
+class Counters(object):
+    def __init__(self):
+        self.lock = Lock()
+        self.counts = {}
+
+
+    def inc(self, name, n=1):
+        with self.lock:
+            self.counts[name] = self.counts.get(name, 0) + n
+
+
+    def snapshot(self):
+        with self.lock:
+            return dict(self.counts)
+
+
+class Histogram(object):
+    def __init__(self, bounds):
+        # "bounds" are the sorted upper bounds of the buckets, values over
+        # the last bound are counted in an extra "+Inf" bucket
+        self.lock = Lock()
+        self.bounds = list(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.total = 0.0
+        self.n = 0
+
+
+    def observe(self, value):
+        with self.lock:
+            self.counts[bisect_left(self.bounds, value)] += 1
+            self.total += value
+            self.n += 1
+
+
+    def snapshot(self):
+        with self.lock:
+            buckets = dict(("le_%g" % b, c) for b, c in zip(self.bounds, self.counts))
+            buckets["le_inf"] = self.counts[-1]
+            return {'count': self.n, 'sum': self.total, 'buckets': buckets}
+
+
+def elapsed_ms(start):
+    # milliseconds since the perf_counter() "start", monotonic
+    return (perf_counter() - start) * 1000.0
+
+
+def percentile(values, q):
+    # nearest rank "q" percentile of the sorted "values"
+    return values[max(0, int(ceil(q * len(values) / 100.0)) - 1)]
+
+
+def summarize(values):
+    values = sorted(values)
+    return {'count': len(values), 'mean': sum(values) / len(values),
+            'p50': percentile(values, 50), 'p95': percentile(values, 95),
+            'p99': percentile(values, 99), 'max': values[-1]}
+
+
+class StageTimings(object):
+    def __init__(self, window=1024):
+        # the last "window" milliseconds of every (stage, batch size)
+        self.lock = Lock()
+        self.window = window
+        self.samples = {}
+
+
+    def observe(self, stage, ms, batch_size=1):
+        with self.lock:
+            key = (stage, batch_size)
+            if key not in self.samples:
+                self.samples[key] = deque(maxlen=self.window)
+            self.samples[key].append(ms)
+
+
+    def snapshot(self):
+        # percentiles of every stage over all the batch sizes and by
+        # batch size
+        with self.lock:
+            samples = dict((key, list(values)) for key, values in self.samples.items())
+
+        stages = {}
+        for (stage, batch_size), values in sorted(samples.items()):
+            stages.setdefault(stage, {})[batch_size] = values
+
+        snapshot = {}
+        for stage, by_size in stages.items():
+            snapshot[stage] = summarize([v for values in by_size.values() for v in values])
+            snapshot[stage]['by_batch_size'] = dict((str(n), summarize(values))
+                                                    for n, values in by_size.items())
+        return snapshot
+
+
+def publish_worker_metrics(redis_db, name, snapshot):
+    redis_db.hset(METRICS_KEY, name, dumps(snapshot))
+
+
+def read_worker_metrics(redis_db):
+    # metrics of every worker, by worker name
+    return dict((name.decode("utf-8"), loads(m.decode("utf-8")))
+                for name, m in redis_db.hgetall(METRICS_KEY).items())
+
+
+def read_worker_timings(redis_db):
+    # stage timings of every worker, by worker name
+    return dict((name, m.get('timings', {})) for name, m in read_worker_metrics(redis_db).items())
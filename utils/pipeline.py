@@ -0,0 +1,99 @@
+"""
+This script provide the staged pipeline of pyacl_app, every stage
+runs in its own thread and hands its output to the next stage
+through a bounded queue, so batch N+1 is prepared and batch N-1 is
+post-processed while batch N runs on the NPU
+
+Copyright 2022 Huawei Technologies Co., Ltd
+
+The busy, starved and blocked times of the stages are measured with
+the monotonic perf_counter.
+
+CREATED:  2026-10-18 16:10:27
+MODIFIED: 2026-10-19 12:52:03
+"""
+# -*- coding:utf-8 -*-
+from time import perf_counter
+from queue import Queue
+from threading import Thread, Lock
+from traceback import format_exc
+
+
+class Stage(Thread):
+    def __init__(self, name, func, inbox=None, outbox=None):
+        # "func" gets the items of "inbox" (None for the first stage)
+        # and returns the item for "outbox" or None to drop it
+        super(Stage, self).__init__(name=name)
+        self.daemon = True
+        self.func = func
+        self.inbox = inbox
+        self.outbox = outbox
+
+        self.lock = Lock()
+        self.started = perf_counter()
+        self.busy = 0.0     # seconds running func
+        self.starved = 0.0  # seconds waiting for an input
+        self.blocked = 0.0  # seconds waiting for room in the output
+        self.items = 0
+
+
+    def run(self):
+        while True:
+            t0 = perf_counter()
+            item = self.inbox.get() if self.inbox is not None else None
+            t1 = perf_counter()
+            try:
+                out = self.func(item)
+            except Exception:
+                # the item is lost, keep the stage running
+                print("[ERROR] %s stage failed:\n%s"% (self.name, format_exc()))
+                out = None
+            t2 = perf_counter()
+            if out is not None and self.outbox is not None:
+                self.outbox.put(out)
+            t3 = perf_counter()
+
+            with self.lock:
+                self.starved += t1 - t0
+                # a first stage returning nothing has waited for its input
+                if out is None and self.inbox is None:
+                    self.starved += t2 - t1
+                else:
+                    self.busy += t2 - t1
+                self.blocked += t3 - t2
+                self.items += out is not None
+
+
+    def snapshot(self):
+        # shares of the wall time, the stage with the highest busy share
+        # is the bottleneck of the pipeline
+        with self.lock:
+            elapsed = max(perf_counter() - self.started, 1e-9)
+            return {'busy': self.busy / elapsed, 'starved': self.starved / elapsed,
+                    'blocked': self.blocked / elapsed, 'items': self.items}
+
+
+class Pipeline(object):
+    def __init__(self, stages, depth):
+        # "stages" is a list of (name, func), "depth" the number of items
+        # that may wait between two stages
+        self.stages = []
+        inbox = None
+        for i, (name, func) in enumerate(stages):
+            outbox = Queue(maxsize=depth) if i < len(stages) - 1 else None
+            self.stages.append(Stage(name, func, inbox, outbox))
+            inbox = outbox
+
+
+    def start(self):
+        for stage in self.stages:
+            stage.start()
+
+
+    def join(self):
+        for stage in self.stages:
+            stage.join()
+
+
+    def snapshot(self):
+        return dict((stage.name, stage.snapshot()) for stage in self.stages)
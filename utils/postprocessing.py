@@ -3,7 +3,7 @@ This script provide postprocessing for inference
 Copyright 2022 Huawei Technologies Co., Ltd
 
 CREATED:  2020-6-04 20:12:13
-MODIFIED: 2021-02-05 23:48:45
+MODIFIED: 2026-10-18 20:31:26
 """
 # -*- coding:utf-8 -*-
 import numpy as np
@@ -14,7 +14,7 @@ from data.constant import ACL_MEMCPY_DEVICE_TO_HOST
 
 def _make_grid(nx=20, ny=20):
     xv, yv = np.meshgrid(np.arange(nx), np.arange(ny))
-    return np.stack((xv, yv), 2).reshape((1, 1, ny, nx, 2)).astype(np.float)
+    return np.stack((xv, yv), 2).reshape((1, 1, ny, nx, 2)).astype(np.float64)
 
 def _sigmoid(x0):
     s = 1 / (1 + np.exp(-x0))
@@ -0,0 +1,119 @@
+"""
+This script is used to time the preprocessing of one image, the former
+chain of copies against preprocess_into a reused buffer, then the
+scaling of preprocess_batch over 1..N threads, for example:
+
+    python3 utils/preprocess_benchmark.py
+    python3 utils/preprocess_benchmark.py ./data/images/kite.jpg 1000 8
+
+Copyright 2022 Huawei Technologies Co., Ltd
+
+The former chain letterboxes the image, transposes, converts and
+normalizes it, then copies it again for the Focus layout, every step
+allocates a new array. The peak of the bytes allocated for one image is
+counted with tracemalloc in a run of its own, the times in runs without it.
+The batches of preprocess_batch are the encoded image decoded on the way,
+with the cv2 and BLAS thread limits of the [transport] section.
+
+CREATED:  2026-10-18 23:10:27
+MODIFIED: 2026-10-18 23:41:52
+"""
+# -*- coding:utf-8 -*-
+# import the necessary packages
+import os
+import sys
+import cv2
+import tracemalloc
+import numpy as np
+
+from os import path
+from time import perf_counter
+from configparser import ConfigParser
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.append(path.abspath('.'))
+from model.backend import parse_shapes
+from utils.threads import limit_threads
+from utils.letterbox import letterbox
+from utils.preprocessing import _focus_process, preprocess, preprocess_into, \
+                                preprocess_batch
+
+# define configurations
+print("[INFO] loading configurations . . .")
+cfg = ConfigParser()
+cfg.read(path.abspath('./data/app.cfg'))
+
+img_path = sys.argv[1] if len(sys.argv) > 1 else cfg.get('test', 'img_path').strip()
+images = int(sys.argv[2]) if len(sys.argv) > 2 else cfg.getint('benchmark', 'images')
+max_threads = int(sys.argv[3]) if len(sys.argv) > 3 else os.cpu_count()
+batch_size = cfg.getint('benchmark', 'batch_size')
+limit_threads(cfg.getint('transport', 'cv2_threads'), cfg.getint('transport', 'blas_threads'))
+h, w = parse_shapes(cfg.get('benchmark', 'input_shape'))[0]
+model_input_size = w, h
+
+img = cv2.cvtColor(cv2.imread(img_path), cv2.COLOR_BGR2RGB)
+out = np.empty((12, h // 2, w // 2), dtype=np.float32)
+
+
+def chain(img):
+    # the preprocessing before preprocess_into
+    img_resize, _ = letterbox(img, (h, w))
+    img_resize = img_resize.transpose(2, 0, 1)  # [h, w, c] to [c, h, w]
+    img_np = img_resize.astype(np.float32) / 255.0
+    img_np = np.expand_dims(img_np, axis=0)
+    return np.ascontiguousarray(_focus_process(img_np))
+
+
+def fused(img):
+    return preprocess_into(img, out, model_input_size)
+
+
+runs = (('chain', chain),
+        ('preprocess', lambda img: preprocess(img, model_input_size)),
+        ('preprocess_into', fused))
+
+fused(img)
+if not np.array_equal(chain(img)[0], out):
+    print("[ERROR] preprocess_into differs from the former chain")
+    sys.exit(1)
+
+print("[INFO] %dx%d image in a %dx%d input, %d images per run"
+      % (img.shape[1], img.shape[0], w, h, images))
+for name, run in runs:
+    run(img)  # warm up
+
+    start = perf_counter()
+    for _ in range(images):
+        run(img)
+    ms = 1000 * (perf_counter() - start) / images
+
+    # the most bytes held at once by the arrays of one image
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    run(img)
+    peak = tracemalloc.get_traced_memory()[1] - before
+    tracemalloc.stop()
+
+    print("[INFO] %-16s %.3f ms per image, %.2f MB allocated per image"
+          % (name, ms, peak / (1024.0 * 1024.0)))
+
+# the batches of every thread count, 1, 2, 4 ... max_threads
+buf = np.fromfile(img_path, dtype=np.uint8)
+batch = [buf] * batch_size
+out_batch = np.empty((batch_size, 12, h // 2, w // 2), dtype=np.float32)
+rounds = max(1, images // batch_size)
+threads = sorted(set([2 ** i for i in range(max_threads.bit_length()) if 2 ** i < max_threads] +
+                     [max_threads]))
+base = None
+for n in threads:
+    with ThreadPoolExecutor(n) as pool:
+        preprocess_batch(batch, model_input_size, out_batch, pool)  # warm up
+
+        start = perf_counter()
+        for _ in range(rounds):
+            preprocess_batch(batch, model_input_size, out_batch, pool)
+        rate = rounds * batch_size / (perf_counter() - start)
+
+    base = base or rate
+    print("[INFO] preprocess_batch %2d threads %.1f images/sec, x%.2f"
+          % (n, rate, rate / base))
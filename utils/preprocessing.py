@@ -1,81 +1,149 @@
-"""
-This script provide preprocessing for inference
-Copyright 2021 Huawei Technologies Co., Ltd
-
-CREATED:  2020-6-04 20:12:13
-MODIFIED: 2021-11-02 23:48:45
-"""
-import numpy as np
-import cv2
-
-# -*- coding:utf-8 -*-
-
-# def _letterbox(img, new_shape=(640, 640), color=(128, 128, 128), auto=True, scaleFill=False, scaleup=True):
-#     # Resize image to a 32-pixel-multiple rectangle https://github.com/ultralytics/yolov3/issues/232
-#     shape = img.shape[:2]  # current shape [height, width]
-#     if isinstance(new_shape, int):
-#         new_shape = (new_shape, new_shape)
-
-#     # Scale ratio (new / old)
-#     r = min(new_shape[0] / shape[0], new_shape[1] / shape[1])
-#     if not scaleup:  # only scale down, do not scale up (for better test mAP)
-#         r = min(r, 1.0)
-
-#     # Compute padding
-#     ratio = r, r  # width, height ratios
-#     new_unpad = int(round(shape[1] * r)), int(round(shape[0] * r))
-#     dw, dh = new_shape[1] - new_unpad[0], new_shape[0] - new_unpad[1]  # wh padding
-
-#     dw /= 2  # divide padding into 2 sides
-#     dh /= 2
-
-#     if shape[::-1] != new_unpad:  # resize
-#         img = cv2.resize(img, new_unpad, interpolation=cv2.INTER_LINEAR)
-#     top, bottom = int(round(dh - 0.1)), int(round(dh + 0.1))
-#     left, right = int(round(dw - 0.1)), int(round(dw + 0.1))
-#     img = cv2.copyMakeBorder(img, top, bottom, left, right, cv2.BORDER_CONSTANT, value=color)  # add border
-#     return img, ratio, (dw, dh)
-
-
-def _resize_image(img, size):
-
-    h, w = img.shape[:2]
-    c = img.shape[2] if len(img.shape)>2 else 1
-
-    if h == w: 
-        return cv2.resize(img, size, cv2.INTER_AREA)
-
-    dif = h if h > w else w
-
-    interpolation = cv2.INTER_AREA if dif > (size[0]+size[1])//2 else \
-                    cv2.INTER_CUBIC
-
-    x_pos = (dif - w)//2
-    y_pos = (dif - h)//2
-
-    if len(img.shape) == 2:
-        mask = np.zeros((dif, dif), dtype=img.dtype)
-        mask.fill(128)
-        mask[y_pos:y_pos+h, x_pos:x_pos+w] = img[:h, :w]
-    else:
-        mask = np.zeros((dif, dif, c), dtype=img.dtype)
-        mask.fill(128)
-        mask[y_pos:y_pos+h, x_pos:x_pos+w, :] = img[:h, :w, :]
-
-    return cv2.resize(mask, size, interpolation)
-
-def _focus_process(x):
-    # x(b,c,w,h) -> y(b,4c,w/2,h/2)
-    return np.concatenate([x[..., ::2, ::2], x[..., 1::2, ::2], x[..., ::2, 1::2], x[..., 1::2, 1::2]], 1)
-
-def preprocess(img, model_input_size):
-    img_resize = _resize_image(img, model_input_size)
-    img_resize = img_resize.transpose(2, 0, 1) # [h, w, c] to [c, h, w]
-    print("[PreProc] img_resize shape:", img_resize.shape)
-
-    img_np = np.array(img_resize, dtype=np.float32) / 255.0 # normalize
-    img_np = np.expand_dims(img_np, axis=0)  # NCHW
-    img_np = np.ascontiguousarray(_focus_process(img_np)) # Focus
-    print("[PreProc] img_np shape:", img_np.shape)
-
-    return img_np
\ No newline at end of file
+"""
+This script provide preprocessing for inference
+Copyright 2021 Huawei Technologies Co., Ltd
+
+preprocess_into resizes the pixels of the image only and writes the
+padding, the normalisation and the Focus layout of the model input in
+one pass into a float32 buffer of the caller, e.g. a shared memory slot.
+The geometry is the plan of utils/letterbox.py, the preprocessing returns
+the ratio_pad of the image with the model input. preprocess_batch spreads
+the images of a batch over a pool of threads, cv2 and the numpy copies
+release the GIL, and writes them into the rows of one batch tensor.
+
+decode_image reads the size of an upload from its header first, files of
+more than max_pixels are refused before they are decoded. A JPEG bigger
+than the model input is decoded at 1/2, 1/4 or 1/8 of its size in the DCT
+domain, the smallest still holding its letterbox, the plan and ratio_pad
+stay the ones of the full size image.
+
+CREATED:  2020-6-04 20:12:13
+MODIFIED: 2026-10-19 00:12:37
+"""
+import numpy as np
+import cv2
+
+from io import BytesIO
+from PIL import Image
+from utils.letterbox import PAD_VALUE, letterbox_plan, resize
+
+# -*- coding:utf-8 -*-
+
+# (row, column) offsets of the 2x2 pixels of the Focus channel blocks
+FOCUS_OFFSETS = ((0, 0), (1, 0), (0, 1), (1, 1))
+
+# JPEG DCT scales of the reduced decode, the largest first
+REDUCED_FLAGS = ((8, cv2.IMREAD_REDUCED_COLOR_8), (4, cv2.IMREAD_REDUCED_COLOR_4),
+                 (2, cv2.IMREAD_REDUCED_COLOR_2))
+
+def _focus_process(x):
+    # x(b,c,w,h) -> y(b,4c,w/2,h/2)
+    return np.concatenate([x[..., ::2, ::2], x[..., 1::2, ::2], x[..., ::2, 1::2], x[..., 1::2, 1::2]], 1)
+
+def _focus_span(pad, size, offset):
+    # focused rows (or columns) [first, last) of the image pixels seen by
+    # the offset of a channel block, and the first image row they take
+    first = (pad - offset + 1) // 2
+    last = (pad + size - offset + 1) // 2
+    return first, last, 2 * first + offset - pad
+
+def read_header(buf):
+    # (h, w, 3) dims and format of an encoded image, a buffer or a file,
+    # only its header is parsed
+    try:
+        img = Image.open(buf if hasattr(buf, 'read') else BytesIO(buf))
+    except (OSError, Image.DecompressionBombError):
+        raise ValueError("buffer is not a valid image")
+
+    return (img.size[1], img.size[0], 3), img.format
+
+def _decode_flag(img_dims, img_format, model_input_size):
+    # the cv2 flag decoding the image at the largest JPEG scale still
+    # holding its letterbox in model_input_size (w, h), the EXIF
+    # orientation is ignored so the dims are the ones of the header
+    if img_format == 'JPEG' and model_input_size is not None:
+        w, h = model_input_size
+        new_unpad = letterbox_plan(img_dims, (h, w))[0]
+        for factor, flag in REDUCED_FLAGS:
+            if -(-img_dims[1] // factor) >= new_unpad[0] and \
+               -(-img_dims[0] // factor) >= new_unpad[1]:
+                return flag | cv2.IMREAD_IGNORE_ORIENTATION
+    return cv2.IMREAD_COLOR | cv2.IMREAD_IGNORE_ORIENTATION
+
+def decode_image(buf, model_input_size=None, max_pixels=0, header=None):
+    # decode an encoded (jpeg, png, ...) image of a bytes, mmap or
+    # array buffer to a RGB array, reduced to the size its letterbox in
+    # model_input_size (w, h) needs, returns it with the dims of the full
+    # size image. header is the read_header of the image if it is known
+    img_dims, img_format = header or read_header(buf)
+    if max_pixels and img_dims[0] * img_dims[1] > max_pixels:
+        raise ValueError("image of %dx%d pixels, at most %d are decoded"
+                         % (img_dims[1], img_dims[0], max_pixels))
+
+    img = cv2.imdecode(np.frombuffer(buf, dtype=np.uint8),
+                       _decode_flag(img_dims, img_format, model_input_size))
+    if img is None:
+        raise ValueError("buffer is not a valid image")
+
+    return cv2.cvtColor(img, cv2.COLOR_BGR2RGB), img_dims
+
+def preprocess_encoded(buf, model_input_size, max_pixels=0):
+    # decode and preprocess an uploaded image, returns the model input,
+    # the RGB image dims and the ratio_pad, model_input_size is (w, h)
+    img, img_dims = decode_image(buf, model_input_size, max_pixels)
+    img_np, ratio_pad = preprocess(img, model_input_size, img_dims)
+    return img_np, img_dims, ratio_pad
+
+def preprocess_into(img, out, model_input_size, img_dims=None):
+    # letterbox the RGB image in model_input_size (w, h), normalize it
+    # and write it in the (12, h/2, w/2) Focus layout into the float32
+    # "out", the same values as _focus_process of the letterboxed image,
+    # returns the ratio_pad of the image. img_dims are the dims of the
+    # full size image of a reduced decode, the geometry is the one of it
+    w, h = model_input_size
+    new_unpad, (left, top, _, _), ratio_pad = letterbox_plan(img_dims or img.shape, (h, w))
+    img_resize = resize(img, new_unpad)
+    pixels = img_resize.transpose(2, 0, 1)  # [h, w, c] to [c, h, w], a view
+    pad = np.float32(PAD_VALUE) / np.float32(255)
+
+    for k, (dy, dx) in enumerate(FOCUS_OFFSETS):
+        block = out[3 * k:3 * k + 3]
+        i0, i1, y = _focus_span(top, new_unpad[1], dy)
+        j0, j1, x = _focus_span(left, new_unpad[0], dx)
+        # the padding around the pixels of the block
+        block[:, :i0] = pad
+        block[:, i1:] = pad
+        block[:, i0:i1, :j0] = pad
+        block[:, i0:i1, j1:] = pad
+        # normalize the pixels of the block straight into "out"
+        np.divide(pixels[:, y::2, x::2], np.float32(255), out=block[:, i0:i1, j0:j1])
+
+    return ratio_pad
+
+def preprocess(img, model_input_size, img_dims=None):
+    # model_input_size is (w, h), the image is letterboxed in it,
+    # returns the model input and the ratio_pad of the image
+    w, h = model_input_size
+    img_np = np.empty((1, 12, h // 2, w // 2), dtype=np.float32)  # NCHW
+    ratio_pad = preprocess_into(img, img_np[0], model_input_size, img_dims)
+
+    return img_np, ratio_pad
+
+def preprocess_batch(images, model_input_size, out, pool=None, max_pixels=0):
+    # letterbox the images in model_input_size (w, h) into the rows of
+    # the (n, 12, h/2, w/2) float32 "out", an image is a RGB array or an
+    # uploaded file decoded on the way. Returns the (image dims,
+    # ratio_pad) of every image, None for the files that are not valid
+    # images or over max_pixels. The images run on the threads of
+    # "pool", if there is one
+    def run(i):
+        img, img_dims = images[i], None
+        if img.ndim == 1:
+            try:
+                img, img_dims = decode_image(img, model_input_size, max_pixels)
+            except ValueError:
+                return None
+        return img_dims or img.shape, preprocess_into(img, out[i], model_input_size, img_dims)
+
+    if pool is None:
+        return [run(i) for i in range(len(images))]
+    return list(pool.map(run, range(len(images))))
@@ -0,0 +1,283 @@
+"""
+This script provide the redis keys and helpers used to pass
+requests and results between flask_app and pyacl_app
+
+Copyright 2022 Huawei Technologies Co., Ltd
+
+Two work queue backends are available, selected by [queue] backend:
+  list   : one redis list, items are popped atomically (at most once)
+  stream : redis stream read by a consumer group, items are acked after
+           their reply is pushed and re-delivered when a worker dies
+           (at least once), so many workers can share one queue. Entries
+           delivered max_deliveries times are dropped, on_drop gets
+           their messages so the api can be told. An entry reclaimed
+           from a slow worker may be processed twice, ack returns the
+           entries acked by this call so only the first acker gives
+           their resources back
+
+During the rollout the default model also reads the list [queue]
+legacy_name the api versions before the codec push to, their replies
+are SET on the request id they poll with GET.
+
+CREATED:  2026-10-18 10:02:13
+MODIFIED: 2026-10-19 12:01:37
+"""
+# -*- coding:utf-8 -*-
+from os import getpid
+from socket import gethostname
+from redis.exceptions import ResponseError
+
+
+def worker_name():
+    # unique name of a worker process, for the consumer group and stats
+    return "%s-%d" % (gethostname(), getpid())
+
+
+def reply_key(k):
+    # every request gets its own reply list
+    return "reply:%s" % k
+
+
+def push_replies(redis_db, replies, ttl):
+    # push the (k, output) replies of a batch in one round trip, the ttl
+    # makes sure replies that nobody waits for anymore are not kept
+    pipe = redis_db.pipeline(transaction=False)
+    for k, output in replies:
+        pipe.rpush(reply_key(k), output)
+        pipe.expire(reply_key(k), ttl)
+    pipe.execute()
+
+
+def set_replies(redis_db, replies, ttl):
+    # the (k, output) replies of the api versions before the reply
+    # lists, they poll the request id with GET
+    pipe = redis_db.pipeline(transaction=False)
+    for k, output in replies:
+        pipe.set(k, output, ex=ttl)
+    pipe.execute()
+
+
+def push_reply(redis_db, k, output, ttl):
+    push_replies(redis_db, [(k, output)], ttl)
+
+
+def wait_reply(redis_db, k, timeout):
+    # block until the output of a request is pushed or the timeout is
+    # reached, returns None on timeout
+    reply = redis_db.blpop(reply_key(k), timeout=timeout)
+    if reply is None:
+        return None
+
+    return reply[1]
+
+
+def cancel_key(k):
+    return "cancel:%s" % k
+
+
+def cancel(redis_db, k, ttl):
+    # mark a queued request as cancelled, the worker drops it unprocessed
+    redis_db.set(cancel_key(k), 1, ex=ttl)
+
+
+def cancelled(redis_db, ks):
+    # return the set of the given request ids that are cancelled
+    pipe = redis_db.pipeline(transaction=False)
+    for k in ks:
+        pipe.exists(cancel_key(k))
+
+    return set(k for k, c in zip(ks, pipe.execute()) if c)
+
+
+class ListQueue(object):
+    def __init__(self, redis_db, name):
+        self.redis_db = redis_db
+        self.name = name
+
+
+    def put(self, msg):
+        self.redis_db.rpush(self.name, msg)
+
+
+    def get(self, count, block_ms):
+        # block for the first item (block_ms 0 does not block), then take
+        # the rest of the batch in one transaction so two workers never
+        # get the same item
+        first = []
+        if block_ms > 0:
+            popped = self.redis_db.blpop(self.name, timeout=block_ms / 1000.0)
+            if popped is None:
+                return []
+            first, count = [popped[1]], count - 1
+
+        rest = []
+        if count > 0:
+            pipe = self.redis_db.pipeline(transaction=True)
+            pipe.lrange(self.name, 0, count - 1)
+            pipe.ltrim(self.name, count, -1)
+            rest, _ = pipe.execute()
+
+        # list items have no entry id, they are gone once popped
+        return [(None, msg) for msg in first + rest]
+
+
+    def ack(self, entry_ids):
+        # popped items are only ever read once
+        return list(entry_ids)
+
+
+    def depth(self):
+        return self.redis_db.llen(self.name)
+
+
+class StreamQueue(object):
+    def __init__(self, redis_db, name, group,
+                 reclaim_idle_ms=30000, max_deliveries=3, on_drop=None):
+        self.redis_db = redis_db
+        self.name = name
+        self.group = group
+        self.consumer = worker_name()
+        self.reclaim_idle_ms = reclaim_idle_ms
+        self.max_deliveries = max_deliveries
+        self.on_drop = on_drop
+        self.has_group = False
+
+
+    def put(self, msg):
+        self.redis_db.xadd(self.name, {"m": msg})
+
+
+    def __create_group(self):
+        # create the consumer group once, other workers may have done it
+        try:
+            self.redis_db.xgroup_create(self.name, self.group, id="0",
+                                        mkstream=True)
+        except ResponseError as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+        self.has_group = True
+
+
+    def __reclaim(self, count):
+        # take over the entries a dead (or stuck) worker has read but
+        # never acked, entries delivered too many times are dropped so
+        # a poison message cannot crash every worker in turn
+        pending = self.redis_db.xpending_range(self.name, self.group, "-", "+",
+                                               count, idle=self.reclaim_idle_ms)
+        if not pending:
+            return []
+
+        dead = [p["message_id"] for p in pending
+                if p["times_delivered"] >= self.max_deliveries]
+        if dead:
+            print("[WARNING] dropping %d entries delivered %d times"%
+                  (len(dead), self.max_deliveries))
+            # claim them to read their messages before they are deleted
+            claimed = self.redis_db.xclaim(self.name, self.group, self.consumer,
+                                           self.reclaim_idle_ms, dead)
+            acked = set(self.ack([entry_id for entry_id, _ in claimed]))
+            if self.on_drop is not None:
+                self.on_drop([fields[b"m"] for entry_id, fields in claimed
+                              if fields and entry_id in acked])
+
+        ids = [p["message_id"] for p in pending
+               if p["times_delivered"] < self.max_deliveries]
+        if not ids:
+            return []
+
+        claimed = self.redis_db.xclaim(self.name, self.group, self.consumer,
+                                       self.reclaim_idle_ms, ids)
+        print("[INFO] reclaimed %d pending entries"% len(claimed))
+        return [(entry_id, fields[b"m"]) for entry_id, fields in claimed if fields]
+
+
+    def get(self, count, block_ms):
+        if not self.has_group:
+            self.__create_group()
+
+        # block_ms 0 does not block
+        entries = self.__reclaim(count)
+        if len(entries) < count:
+            block = int(block_ms) if block_ms > 0 and not entries else None
+            streams = self.redis_db.xreadgroup(self.group, self.consumer,
+                                               {self.name: ">"},
+                                               count=count - len(entries),
+                                               block=block)
+            for _, stream_entries in streams or []:
+                entries += [(entry_id, fields[b"m"])
+                            for entry_id, fields in stream_entries]
+
+        return entries
+
+
+    def ack(self, entry_ids):
+        # acked entries are deleted as well to keep the stream short,
+        # returns the ids that were still pending, the ones another
+        # worker has acked already are left out
+        if not entry_ids:
+            return []
+        pipe = self.redis_db.pipeline(transaction=False)
+        for entry_id in entry_ids:
+            pipe.xack(self.name, self.group, entry_id)
+        pipe.xdel(self.name, *entry_ids)
+        acked = pipe.execute()[:-1]
+        return [entry_id for entry_id, n in zip(entry_ids, acked) if n]
+
+
+    def depth(self):
+        # waiting and in-flight entries
+        return self.redis_db.xlen(self.name)
+
+
+class LegacyQueue(object):
+    # the queue of the model with the list of the old api versions,
+    # drained first without blocking, the new messages go to the queue
+    def __init__(self, queue, legacy):
+        self.queue = queue
+        self.legacy = legacy
+
+
+    def put(self, msg):
+        self.queue.put(msg)
+
+
+    def get(self, count, block_ms):
+        entries = self.legacy.get(count, 0)
+        if len(entries) < count:
+            entries += self.queue.get(count - len(entries), 0 if entries else block_ms)
+        return entries
+
+
+    def ack(self, entry_ids):
+        # the list items have no entry id
+        acked = self.queue.ack([entry_id for entry_id in entry_ids if entry_id is not None])
+        return acked + [None] * sum(entry_id is None for entry_id in entry_ids)
+
+
+    def depth(self):
+        return self.queue.depth() + self.legacy.depth()
+
+
+def make_queue(redis_db, cfg, on_drop=None, legacy=False):
+    # build the work queue configured in the [queue] section, "on_drop"
+    # gets the messages of the entries dropped without being processed,
+    # "legacy" reads the list of the old api versions as well, for the
+    # default model
+    backend = cfg.get('queue', 'backend')
+    name = cfg.get('queue', 'name')
+    if backend == 'list':
+        queue = ListQueue(redis_db, name)
+    elif backend == 'stream':
+        if cfg.getint('queue', 'reclaim_idle_ms') >= 500 * cfg.getfloat('queue', 'deadline'):
+            print("[WARNING] reclaim_idle_ms is not well below the deadline, the entries "
+                  "of a dead worker expire before they are redelivered")
+        queue = StreamQueue(redis_db, name, cfg.get('queue', 'group'),
+                            cfg.getint('queue', 'reclaim_idle_ms'),
+                            cfg.getint('queue', 'max_deliveries'), on_drop)
+    else:
+        raise ValueError("unknown queue backend %s" % backend)
+
+    legacy_name = cfg.get('queue', 'legacy_name', fallback='').strip()
+    if legacy and legacy_name and legacy_name != name:
+        return LegacyQueue(queue, ListQueue(redis_db, legacy_name))
+    return queue
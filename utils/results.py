@@ -0,0 +1,97 @@
+"""
+This script provide the response formats of the detections,
+selected by the Accept header of the request
+
+Copyright 2022 Huawei Technologies Co., Ltd
+
+Formats:
+  application/json         : {"id", "count", "bboxes": {"x1": [..], "y1",
+                             "x2", "y2", "conf", "class_id", "class_name"}}
+  application/x-msgpack    : same keys, the arrays are packed little endian
+                             bytes (float32, class_id int16), needs msgpack
+  application/octet-stream : magic(4s) count(I) then x1, y1, x2, y2, conf as
+                             float32[count] and class_id as int16[count]
+
+CREATED:  2026-10-18 14:40:18
+MODIFIED: 2026-10-18 14:40:18
+"""
+# -*- coding:utf-8 -*-
+import numpy as np
+
+from json import dumps
+from struct import Struct
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+
+BINARY_MAGIC = b'DETS'
+_BINARY_HEADER = Struct('<4sI')
+
+_COLUMNS = ('x1', 'y1', 'x2', 'y2', 'conf')
+
+
+def load_class_names(names_path):
+    with open(names_path) as f:
+        return [name.strip() for name in f.read().splitlines() if name.strip()]
+
+
+def mimetypes():
+    # the response formats available, the first one is the default
+    types = ['application/json', 'application/octet-stream']
+    if msgpack is not None:
+        types.append('application/x-msgpack')
+    return types
+
+
+def _columns(dets):
+    # split the (n, 6) detections into contiguous typed columns
+    cols = dict((name, np.ascontiguousarray(dets[:, i], dtype=np.float32))
+                for i, name in enumerate(_COLUMNS))
+    cols['class_id'] = dets[:, 5].astype(np.int16)
+    return cols
+
+
+def _class_names(class_ids, names):
+    return [names[i] if 0 <= i < len(names) else str(i) for i in class_ids.tolist()]
+
+
+def to_json(k, dets, names=None):
+    cols = _columns(dets)
+    bboxes = dict((name, np.round(cols[name].astype(np.float64), 4).tolist())
+                  for name in _COLUMNS)
+    bboxes['class_id'] = cols['class_id'].tolist()
+    if names:
+        bboxes['class_name'] = _class_names(cols['class_id'], names)
+
+    return dumps({'id': k, 'count': len(dets), 'bboxes': bboxes})
+
+
+def to_msgpack(k, dets, names=None):
+    cols = _columns(dets)
+    bboxes = dict((name, col.astype('<' + col.dtype.str[1:]).tobytes())
+                  for name, col in cols.items())
+    if names:
+        bboxes['class_name'] = _class_names(cols['class_id'], names)
+
+    return msgpack.packb({'id': k, 'count': len(dets), 'bboxes': bboxes},
+                         use_bin_type=True)
+
+
+def to_binary(k, dets, names=None):
+    cols = _columns(dets)
+    return b''.join([_BINARY_HEADER.pack(BINARY_MAGIC, len(dets))] +
+                    [cols[name].astype('<f4').tobytes() for name in _COLUMNS] +
+                    [cols['class_id'].astype('<i2').tobytes()])
+
+
+def render(k, dets, mimetype, names=None):
+    # serialize the detections in the given format
+    if mimetype == 'application/x-msgpack':
+        return to_msgpack(k, dets, names)
+    if mimetype == 'application/octet-stream':
+        return to_binary(k, dets, names)
+
+    return to_json(k, dets, names)
@@ -0,0 +1,145 @@
+"""
+This script provide a shared memory slot ring, used to hand the
+preprocessed tensors from flask_app to pyacl_app on the same host
+without sending them through redis
+
+Copyright 2022 Huawei Technologies Co., Ltd
+
+The ring is created by the first worker, the free slot indexes are
+kept in the redis list "<name>:free:<generation>". The api pops a free
+slot, writes the tensor into it and only sends the slot index over the
+queue, the worker gives the slot back after the image is processed.
+
+Every publish announces a new generation with a free list of its own.
+When the owner restarts, its ring is unlinked and a new one is published,
+the api and the other workers see the generation change and attach to
+the new ring. The messages of the old generation are refused, their
+slots are not released into the free list of the new one.
+
+CREATED:  2026-10-18 11:30:02
+MODIFIED: 2026-10-19 09:52:18
+"""
+# -*- coding:utf-8 -*-
+import numpy as np
+
+from json import dumps, loads
+from uuid import uuid4
+
+try:
+    from multiprocessing import shared_memory, resource_tracker
+except ImportError: # python < 3.8
+    shared_memory = None
+
+
+class ShmRing(object):
+    def __init__(self, name, slots, slot_size, create=False, generation=None):
+        if shared_memory is None:
+            raise RuntimeError("shared memory transport needs python >= 3.8")
+
+        self.name = name
+        self.slots = slots
+        self.slot_size = slot_size
+        self.generation = generation
+        self.owner = False
+
+        if create:
+            try:
+                self.shm = shared_memory.SharedMemory(name=name, create=True,
+                                                      size=slots * slot_size)
+                self.owner = True
+            except FileExistsError:
+                # another worker on this host has created it already
+                create = False
+
+        if not create:
+            self.shm = shared_memory.SharedMemory(name=name)
+            # only the owner may unlink the ring, keep the resource
+            # tracker from removing it when this process exits
+            try:
+                resource_tracker.unregister(self.shm._name, "shared_memory")
+            except Exception:
+                pass
+
+        if self.shm.size < slots * slot_size:
+            raise RuntimeError("shared memory %s is smaller than %d slots of %d bytes"
+                               % (name, slots, slot_size))
+
+
+    def view(self, slot, dtype, shape):
+        # numpy view over a slot, no copy is made
+        dtype = np.dtype(dtype)
+        count = int(np.prod(shape))
+        if count * dtype.itemsize > self.slot_size:
+            raise ValueError("array of %d bytes does not fit a %d bytes slot"
+                             % (count * dtype.itemsize, self.slot_size))
+
+        return np.frombuffer(self.shm.buf, dtype=dtype, count=count,
+                             offset=slot * self.slot_size).reshape(shape)
+
+
+    def free_key(self, generation=None):
+        return "%s:free:%s" % (self.name, generation or self.generation)
+
+
+    def publish(self, redis_db):
+        # called by the owner, announces the ring under a new generation
+        # and marks all slots free, the free list of the replaced ring
+        # is deleted
+        previous = announcement(redis_db, self.name)
+        self.generation = uuid4().hex
+        pipe = redis_db.pipeline(transaction=True)
+        if previous is not None and previous.get('generation'):
+            pipe.delete(self.free_key(previous['generation']))
+        pipe.rpush(self.free_key(), *range(self.slots))
+        pipe.set(self.name, dumps({'slots': self.slots, 'slot_size': self.slot_size,
+                                   'generation': self.generation}))
+        pipe.execute()
+
+
+    def stale(self, redis_db):
+        # true once another ring has been published under our name
+        info = announcement(redis_db, self.name)
+        return info is None or info.get('generation') != self.generation
+
+
+    def acquire(self, redis_db, timeout):
+        # block until a slot is free, returns None on timeout
+        slot = redis_db.blpop(self.free_key(), timeout=timeout)
+        if slot is None:
+            return None
+
+        return int(slot[1])
+
+
+    def release(self, redis_db, slots):
+        if slots:
+            redis_db.rpush(self.free_key(), *slots)
+
+
+    def close(self):
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+
+def announcement(redis_db, name):
+    # slots, slot_size and generation of the ring published as "name"
+    info = redis_db.get(name)
+    if info is None:
+        return None
+
+    return loads(info.decode("utf-8"))
+
+
+def attach_ring(redis_db, name):
+    # attach to the ring announced by a worker, None if there is none or
+    # its owner is gone
+    info = announcement(redis_db, name)
+    if info is None:
+        return None
+
+    try:
+        return ShmRing(name, info['slots'], info['slot_size'],
+                       generation=info.get('generation'))
+    except FileNotFoundError:
+        return None
@@ -4,7 +4,7 @@ This script is used to test flask rest api via multithreading
 Copyright 2022 Huawei Technologies Co., Ltd
 
 CREATED:  2022-02-10 01:12:13
-MODIFIED: 2022-02-10 14:48:45
+MODIFIED: 2026-10-18 13:52:09
 """
 # -*- coding:utf-8 -*-
 # import the necessary packages
@@ -28,8 +28,8 @@ def call_predict_endpoint(n):
     r = post(cfg.get('test', 'url'), files=payload).json()
     print(r)
 
-    # ensure the request was sucessful
-    if r["bboxes"]:
+    # ensure the request was sucessful, shed requests have no bboxes
+    if r.get("bboxes"):
         print("[INFO] thread {} OK".format(n))
     # otherwise, the request failed
     else:
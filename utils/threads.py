@@ -0,0 +1,41 @@
+"""
+This script provide the thread limits of the native libraries, so the
+threads of a preprocess pool do not each start a team of cv2, OpenMP
+and BLAS threads on every core
+
+Copyright 2022 Huawei Technologies Co., Ltd
+
+The OpenMP and BLAS libraries read their environment variables when
+they are loaded, the limits are set in the environment for the ones
+loaded later and, with threadpoolctl installed, on the loaded ones.
+A limit of 0 keeps the default of the library.
+
+CREATED:  2026-10-18 23:41:52
+MODIFIED: 2026-10-18 23:41:52
+"""
+# -*- coding:utf-8 -*-
+import os
+import cv2
+
+
+# environment variables of the OpenMP and BLAS thread pools
+BLAS_ENV = ('OMP_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'MKL_NUM_THREADS',
+            'BLIS_NUM_THREADS', 'VECLIB_MAXIMUM_THREADS', 'NUMEXPR_NUM_THREADS')
+
+
+def limit_threads(cv2_threads=0, blas_threads=0):
+    if cv2_threads > 0:
+        cv2.setNumThreads(cv2_threads)
+
+    if blas_threads > 0:
+        for name in BLAS_ENV:
+            os.environ[name] = str(blas_threads)
+        try:
+            from threadpoolctl import threadpool_limits
+            threadpool_limits(blas_threads)
+        except ImportError:
+            pass
+
+    print("[INFO] %d cv2 threads, %s BLAS threads"
+          % (cv2.getNumThreads(), blas_threads or "default"))
+
@@ -0,0 +1,44 @@
+"""
+This script provide the spooling of the uploaded files of the api, the
+small ones stay in memory, the big ones are written to a temporary file
+while the request body is parsed, never held in memory as a whole
+
+Copyright 2022 Huawei Technologies Co., Ltd
+
+upload_buffer gives the bytes of an upload to the decoders without the
+read() and BytesIO copies, a big upload is a read only mmap of its
+temporary file, its pages are read from the page cache as the decoder
+needs them.
+
+CREATED:  2026-10-19 00:12:37
+MODIFIED: 2026-10-19 00:12:37
+"""
+# -*- coding:utf-8 -*-
+import io
+import mmap
+
+from tempfile import TemporaryFile
+
+
+def spool_stream(total_content_length, spool_size):
+    # the stream a file of the request body is written to, in memory
+    # up to spool_size bytes of body
+    if total_content_length is not None and total_content_length <= spool_size:
+        return io.BytesIO()
+    return TemporaryFile('wb+')
+
+
+def upload_buffer(stream):
+    # the bytes of an uploaded file, a mmap of the temporary file or the
+    # value of the in memory stream, a mmap is unmapped once nothing
+    # holds it
+    if isinstance(stream, io.BytesIO):
+        return stream.getvalue()
+
+    try:
+        stream.flush()
+        return mmap.mmap(stream.fileno(), 0, access=mmap.ACCESS_READ)
+    except (AttributeError, OSError, ValueError, io.UnsupportedOperation):
+        # an empty file can not be mapped, a stream without file
+        stream.seek(0)
+        return stream.read()